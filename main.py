@@ -7,17 +7,19 @@ Unified interface for FAL.AI video generation services
 import asyncio
 import json
 import os
+import stat
 import sys
 import logging
 import argparse
 from pathlib import Path
 from typing import Optional, Dict, Any
 from datetime import datetime
+from functools import wraps
 
 import fal_client
 import click
 from colorama import init, Fore, Style
-from security import security_manager, InputValidator
+from security import get_security_manager, InputValidator
 
 # Initialize colorama for Windows compatibility
 init()
@@ -174,7 +176,7 @@ class Config:
     def set_api_key(self):
         """Set FAL API key securely"""
         try:
-            api_key = security_manager.get_secure_api_key()
+            api_key = get_security_manager().get_secure_api_key()
             os.environ["FAL_KEY"] = api_key
             print(f"{Fore.GREEN}✅ API key configured securely{Style.RESET_ALL}")
             return True
@@ -186,6 +188,14 @@ class Config:
 #                            Video Generators                             
 # ========================================================================
 
+def bounded_generation(func):
+    """Run a VideoGenerator coroutine inside its concurrency slot"""
+    @wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        async with self._generation_slot():
+            return await func(self, *args, **kwargs)
+    return wrapper
+
 class VideoGenerator:
     def __init__(self, config: Config):
         self.config = config
@@ -194,6 +204,35 @@ class VideoGenerator:
         # Ensure output directory exists
         output_dir = Path(config.get("output_directory", "./data/outputs"))
         output_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Kling Pro endpoint and defaults are static per config, resolve them once
+        self._kling_pro_endpoint = config.get("models", {}).get("kling_pro", "fal-ai/kling-video/v1/pro/image-to-video")
+        self._kling_pro_defaults = {
+            "duration": config.get("max_duration", 10),
+            "aspect_ratio": config.get("default_aspect_ratio", "9:16")
+        }
+        
+        # Bound concurrent generations; the semaphore is created lazily inside the running loop
+        self._max_concurrent_generations = config.get("max_concurrent_generations", 8)
+        self._inflight: Optional[asyncio.Semaphore] = None
+        self._inflight_loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def _generation_slot(self) -> asyncio.Semaphore:
+        """Semaphore shared by all generate_* calls on this generator (one per event loop)"""
+        loop = asyncio.get_running_loop()
+        if self._inflight is None or self._inflight_loop is not loop:
+            self._inflight = asyncio.Semaphore(self._max_concurrent_generations)
+            self._inflight_loop = loop
+        return self._inflight
+    
+    def _require_file(self, file_path: str) -> None:
+        """Raise FileNotFoundError unless file_path is an existing regular file"""
+        try:
+            st = os.stat(file_path)
+        except OSError as e:
+            raise FileNotFoundError(f"Image file not found: {file_path}") from e
+        if not stat.S_ISREG(st.st_mode):
+            raise FileNotFoundError(f"Image path is not a file: {file_path}")
     
     def upload_file(self, file_path: str) -> str:
         """Upload file to FAL and return URL"""
@@ -212,17 +251,18 @@ class VideoGenerator:
             for log_entry in update.logs:
                 print(f"{Fore.CYAN}[Progress] {log_entry['message']}{Style.RESET_ALL}")
     
+    @bounded_generation
     async def generate_kling_pro(self, image_path: str, prompt: str, **kwargs) -> Dict[str, Any]:
         """Generate video using Kling Pro model with security validation"""
         try:
             print(f"{Fore.GREEN}🎬 Starting Kling Pro generation...{Style.RESET_ALL}")
             
             # Validate and sanitize all inputs
-            validated_inputs = security_manager.validate_and_sanitize_inputs(
+            validated_inputs = get_security_manager().validate_and_sanitize_inputs(
                 image_path=image_path,
                 prompt=prompt,
-                duration=kwargs.get("duration", self.config.get("max_duration", 10)),
-                aspect_ratio=kwargs.get("aspect_ratio", self.config.get("default_aspect_ratio", "9:16")),
+                duration=kwargs.get("duration", self._kling_pro_defaults["duration"]),
+                aspect_ratio=kwargs.get("aspect_ratio", self._kling_pro_defaults["aspect_ratio"]),
                 **{k: v for k, v in kwargs.items() if k in ["tail_image_path", "negative_prompt", "cfg_scale"]}
             )
             
@@ -254,7 +294,7 @@ class VideoGenerator:
             
             # Submit job
             result = fal_client.subscribe(
-                self.config.get("models", {}).get("kling_pro", "fal-ai/kling-video/v1/pro/image-to-video"),
+                self._kling_pro_endpoint,
                 arguments=arguments,
                 with_logs=True,
                 on_queue_update=self.on_queue_update,
@@ -270,11 +310,15 @@ class VideoGenerator:
             print(f"{Fore.RED}❌ Generation failed: {e}{Style.RESET_ALL}")
             raise
     
+    @bounded_generation
     async def generate_kling_v16(self, image_path: str, prompt: str, **kwargs) -> Dict[str, Any]:
         """Generate video using Kling v1.6 model with async support"""
         try:
             print(f"{Fore.GREEN}🎬 Starting Kling v1.6 generation...{Style.RESET_ALL}")
             
+            # Fail fast on a missing file before any network work
+            self._require_file(image_path)
+            
             # Upload images
             start_url = self.upload_file(image_path)
             
@@ -321,11 +365,15 @@ class VideoGenerator:
             print(f"{Fore.RED}❌ Generation failed: {e}{Style.RESET_ALL}")
             raise
     
+    @bounded_generation
     async def generate_kling_21_standard(self, image_path: str, prompt: str, **kwargs) -> Dict[str, Any]:
         """Generate video using Kling 2.1 Standard model"""
         try:
             print(f"{Fore.GREEN}🎬 Starting Kling 2.1 Standard generation...{Style.RESET_ALL}")
             
+            # Fail fast on a missing file before any network work
+            self._require_file(image_path)
+            
             # Upload image
             image_url = self.upload_file(image_path)
             
@@ -363,11 +411,15 @@ class VideoGenerator:
             print(f"{Fore.RED}❌ Generation failed: {e}{Style.RESET_ALL}")
             raise
     
+    @bounded_generation
     async def generate_kling_21_pro(self, image_path: str, prompt: str, **kwargs) -> Dict[str, Any]:
         """Generate video using Kling 2.1 Pro model"""
         try:
             print(f"{Fore.GREEN}🎬 Starting Kling 2.1 Pro generation...{Style.RESET_ALL}")
             
+            # Fail fast on a missing file before any network work
+            self._require_file(image_path)
+            
             # Upload image
             image_url = self.upload_file(image_path)
             
@@ -405,11 +457,15 @@ class VideoGenerator:
             print(f"{Fore.RED}❌ Generation failed: {e}{Style.RESET_ALL}")
             raise
     
+    @bounded_generation
     async def generate_kling_21_master(self, image_path: str, prompt: str, **kwargs) -> Dict[str, Any]:
         """Generate video using Kling 2.1 Master model"""
         try:
             print(f"{Fore.GREEN}🎬 Starting Kling 2.1 Master generation...{Style.RESET_ALL}")
             
+            # Fail fast on a missing file before any network work
+            self._require_file(image_path)
+            
             # Upload image
             image_url = self.upload_file(image_path)
             
@@ -447,6 +503,7 @@ class VideoGenerator:
             print(f"{Fore.RED}❌ Generation failed: {e}{Style.RESET_ALL}")
             raise
 
+    @bounded_generation
     async def run_workflow(self, **kwargs) -> Dict[str, Any]:
         """Run custom workflow"""
         try:
@@ -489,11 +546,15 @@ class VideoGenerator:
             print(f"{Fore.RED}❌ Workflow failed: {e}{Style.RESET_ALL}")
             raise
     
+    @bounded_generation
     async def generate_video(self, endpoint: str, image_path: str, prompt: str, **kwargs) -> Dict[str, Any]:
         """Universal video generation method for any endpoint"""
         try:
             print(f"{Fore.GREEN}🎬 Starting video generation with {endpoint}...{Style.RESET_ALL}")
             
+            # Fail fast on a missing file before any network work
+            self._require_file(image_path)
+            
             # Upload image
             image_url = self.upload_file(image_path)
             
@@ -546,6 +607,8 @@ class VideoGenerator:
 class InteractiveCLI:
     def __init__(self, generator: VideoGenerator):
         self.generator = generator
+        # Why the last get_file_path call rejected input ("invalid_path", "validation_error"), or None
+        self.last_error: Optional[str] = None
     
     def show_banner(self):
         """Display application banner"""
@@ -568,6 +631,7 @@ class InteractiveCLI:
     
     def get_file_path(self, prompt: str) -> Optional[str]:
         """Get and validate file path from user with security checks"""
+        self.last_error = None
         while True:
             try:
                 path = input(f"{prompt}: ").strip()
@@ -577,15 +641,18 @@ class InteractiveCLI:
                 # Use security validation
                 validated_path = InputValidator.sanitize_file_path(path)
                 if validated_path:
+                    self.last_error = None
                     print(f"{Fore.GREEN}✅ File validated: {validated_path}{Style.RESET_ALL}")
                     return validated_path
                 else:
+                    self.last_error = "invalid_path"
                     print(f"{Fore.RED}❌ Invalid or unsafe file path. Please try again.{Style.RESET_ALL}")
                     
             except KeyboardInterrupt:
                 print(f"\n{Fore.YELLOW}Operation cancelled.{Style.RESET_ALL}")
                 return None
             except Exception as e:
+                self.last_error = "validation_error"
                 print(f"{Fore.RED}❌ Error validating file: {e}{Style.RESET_ALL}")
     
     async def run_interactive(self):
@@ -9,11 +9,13 @@ import hashlib
 import json
 import logging
 import time
-from typing import Dict, List, Optional, Any, Callable
+from typing import Dict, List, Optional, Any, Callable, Tuple
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from pathlib import Path
 import aiofiles
+import aiofiles.os
 try:
     import aiohttp
 except ImportError:
@@ -217,6 +219,39 @@ class CacheManager:
 cache_manager = CacheManager()
 
 
+class TTLCache:
+    """Bounded key-value store: entries expire ttl seconds after their last
+    update and the least recently updated keys are evicted first"""
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()  # key -> (expires_at, value)
+        
+    def __setitem__(self, key: str, value: Any) -> None:
+        now = time.monotonic()
+        self._entries[key] = (now + self.ttl, value)
+        self._entries.move_to_end(key)
+        # Oldest updates sit at the front, so expiry and overflow trim from there
+        while self._entries:
+            oldest, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) <= self.maxsize:
+                break
+            del self._entries[oldest]
+            
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return default
+        return entry[1]
+        
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
 # ========================================================================
 #                          Performance Decorators                        
 # ========================================================================
@@ -297,8 +332,9 @@ def cache_result(ttl: int = 3600, key_func: Optional[Callable] = None):
 class AsyncFileManager:
     """High-performance async file operations with caching"""
     
-    def __init__(self, chunk_size: int = 8192):
+    def __init__(self, chunk_size: int = 8192, write_buffer_size: int = 1024 * 1024):
         self.chunk_size = chunk_size
+        self.write_buffer_size = write_buffer_size  # 1MB writes keep syscalls low for uploads
         self.file_cache: Dict[str, bytes] = {}
         self.max_cache_size = 100 * 1024 * 1024  # 100MB max cache
         self.current_cache_size = 0
@@ -331,23 +367,64 @@ class AsyncFileManager:
         path_obj = Path(file_path)
         path_obj.parent.mkdir(parents=True, exist_ok=True)
         
-        async with aiofiles.open(file_path, 'wb') as f:
+        async with aiofiles.open(file_path, 'wb', buffering=self.write_buffer_size) as f:
             await f.write(data)
     
+    @performance_monitor_decorator("file_stream_write")
+    async def write_stream(self, file_path: str, source: Any, max_size: Optional[int] = None,
+                           chunk_size: int = 64 * 1024) -> int:
+        """Async streaming write from any source with an async read(size) method
+        
+        Returns the number of bytes written. If the stream grows beyond max_size the
+        partial file is removed and ValueError is raised.
+        """
+        size = 0
+        try:
+            async with aiofiles.open(file_path, 'wb', buffering=self.write_buffer_size) as f:
+                while True:
+                    chunk = await source.read(chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if max_size is not None and size > max_size:
+                        raise ValueError(f"Stream exceeds maximum size of {max_size} bytes")
+                    await f.write(chunk)
+        except BaseException:
+            Path(file_path).unlink(missing_ok=True)
+            raise
+        
+        return size
+    
     @performance_monitor_decorator("file_copy")
     async def copy_file(self, src_path: str, dst_path: str) -> None:
-        """Async file copying with chunked reading"""
+        """Async file copying with chunked reading into a reused buffer"""
         dst_obj = Path(dst_path)
         dst_obj.parent.mkdir(parents=True, exist_ok=True)
-        
+
+        # Single buffer for the whole copy; memoryview slices avoid per-chunk bytes copies
+        buffer = bytearray(self.chunk_size)
+        view = memoryview(buffer)
+
         async with aiofiles.open(src_path, 'rb') as src, \
-                   aiofiles.open(dst_path, 'wb') as dst:
-            
+                   aiofiles.open(dst_path, 'wb', buffering=self.write_buffer_size) as dst:
+
             while True:
-                chunk = await src.read(self.chunk_size)
-                if not chunk:
+                read = await src.readinto(buffer)
+                if not read:
                     break
-                await dst.write(chunk)
+                await dst.write(view[:read])
+    
+    async def is_file(self, file_path: str) -> bool:
+        """Async check that a path is an existing regular file"""
+        return await aiofiles.os.path.isfile(file_path)
+    
+    async def delete_file(self, file_path: str) -> None:
+        """Async file removal, dropping any cached copy"""
+        await aiofiles.os.remove(file_path)
+        
+        old_data = self.file_cache.pop(str(file_path), None)
+        if old_data is not None:
+            self.current_cache_size -= len(old_data)
     
     def _add_to_cache(self, file_path: str, data: bytes):
         """Add file to cache with size management"""
@@ -622,6 +699,7 @@ async def optimized_api_call(url: str, method: str = "GET", **kwargs) -> Dict[st
 __all__ = [
     'performance_monitor',
     'cache_manager', 
+    'TTLCache',
     'async_file_manager',
     'batch_processor',
     'performance_optimizer',
@@ -8,17 +8,57 @@ import asyncio
 import aiohttp
 import time
 import json
-import statistics
+import random
+import socket
+from array import array
+from collections import deque
+try:
+    import orjson
+except ImportError:
+    orjson = None
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple, Iterable, Callable, Awaitable
 from dataclasses import dataclass, field
-from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
 import logging
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Monotonic high-resolution clock for all interval measurements
+_now = time.perf_counter
+
+# Outcome of one request: (response_time, status, error); error is None for accepted responses
+RequestResult = Tuple[Optional[float], Optional[int], Optional[str]]
+
+def _percentile(sorted_values, pct: float) -> float:
+    """Percentile of already sorted values, interpolating linearly between closest ranks"""
+    rank = (len(sorted_values) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (rank - lower)
+
+async def run_bounded(coro_factory: Callable[[], Awaitable[Any]], n: int, concurrency: int) -> List[Any]:
+    """Await coro_factory() n times using a fixed pool of `concurrency` workers"""
+    results = []
+    remaining = iter(range(n))  # Shared by the workers, so each call is taken exactly once
+    
+    async def worker():
+        for _ in remaining:
+            results.append(await coro_factory())
+    
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, n))))
+    return results
+
+async def _drain(response: aiohttp.ClientResponse):
+    """Consume a response body we only time, without decoding it to text"""
+    if response.content_length and response.content_length > 1_000_000:
+        async for _ in response.content.iter_chunked(65536):
+            pass
+    else:
+        await response.read()
+
 @dataclass
 class TestMetrics:
     """Performance test metrics"""
@@ -26,51 +66,125 @@ class TestMetrics:
     total_requests: int = 0
     successful_requests: int = 0
     failed_requests: int = 0
-    response_times: List[float] = field(default_factory=list)
-    error_messages: List[str] = field(default_factory=list)
-    start_time: float = 0
+    response_times: array = field(default_factory=lambda: array('d'))  # Contiguous float64 buffer
+    error_messages: deque = field(default_factory=lambda: deque(maxlen=64))  # Most recent errors only
+    start_time: float = 0  # perf_counter() reading, only meaningful as a difference
     end_time: float = 0
     
-    @property
+    # Derived values are memoized; finalize() refreshes them once the test has ended
+    _CACHED = ("success_rate", "sorted_response_times", "avg_response_time",
+               "p95_response_time", "total_duration", "requests_per_second")
+    
+    @cached_property
     def success_rate(self) -> float:
         if self.total_requests == 0:
             return 0
         return (self.successful_requests / self.total_requests) * 100
     
-    @property
+    @cached_property
+    def sorted_response_times(self) -> List[float]:
+        return sorted(self.response_times)
+    
+    @cached_property
     def avg_response_time(self) -> float:
         if not self.response_times:
             return 0
-        return statistics.mean(self.response_times)
+        return sum(self.response_times) / len(self.response_times)
     
-    @property
+    @cached_property
     def p95_response_time(self) -> float:
         if not self.response_times:
             return 0
-        return statistics.quantiles(self.response_times, n=20)[18]  # 95th percentile
+        return _percentile(self.sorted_response_times, 95)
     
-    @property
+    @cached_property
     def total_duration(self) -> float:
         return self.end_time - self.start_time
     
-    @property
+    @cached_property
     def requests_per_second(self) -> float:
         if self.total_duration == 0:
             return 0
         return self.total_requests / self.total_duration
+    
+    def finalize(self):
+        """Freeze the metrics after end_time is set: drop stale cached values and compute them once"""
+        for name in self._CACHED:
+            self.__dict__.pop(name, None)
+        for name in self._CACHED:
+            getattr(self, name)
+    
+    def summarize(self) -> Dict[str, Any]:
+        """All report aggregates from a single sort of the response times"""
+        times = self.sorted_response_times
+        if times:
+            p50, p95, p99 = (_percentile(times, pct) for pct in (50, 95, 99))
+        else:
+            p50 = p95 = p99 = 0
+        
+        return {
+            "total_requests": self.total_requests,
+            "successful_requests": self.successful_requests,
+            "failed_requests": self.failed_requests,
+            "success_rate": self.success_rate,
+            "avg_response_time": self.avg_response_time,
+            "p50_response_time": p50,
+            "p95_response_time": p95,
+            "p99_response_time": p99,
+            "requests_per_second": self.requests_per_second,
+            "total_duration": self.total_duration,
+        }
+    
+    def record_results(self, results: Iterable[RequestResult]):
+        """Fold a finished batch of request results into the counters in one pass"""
+        results = list(results)
+        self.response_times.extend(r[0] for r in results if r[0] is not None)
+        errors = [r[2] for r in results if r[2] is not None]
+        self.error_messages.extend(errors)
+        self.total_requests += len(results)
+        self.failed_requests += len(errors)
+        self.successful_requests += len(results) - len(errors)
 
 
 class PerformanceTester:
-    """Comprehensive performance testing suite"""
+    """Comprehensive performance testing suite
+    
+    Runs in measurement mode: responses are requested uncompressed
+    (Accept-Encoding: identity) and never decompressed client-side, so timings
+    reflect the server rather than zlib work in the client.
+    """
     
     def __init__(self, base_url: str = "http://127.0.0.1:8001"):
         self.base_url = base_url
         self.session: Optional[aiohttp.ClientSession] = None
         self.test_results: Dict[str, TestMetrics] = {}
+        self._url_cache: Dict[str, str] = {}  # endpoint -> full URL
+    
+    def _url(self, endpoint: str) -> str:
+        """Full URL for an endpoint, built once per endpoint"""
+        url = self._url_cache.get(endpoint)
+        if url is None:
+            url = self._url_cache[endpoint] = f"{self.base_url}{endpoint}"
+        return url
     
     async def __aenter__(self):
         """Async context manager entry"""
-        self.session = aiohttp.ClientSession()
+        # One pooled session for the whole suite; the connector bounds open sockets and
+        # resolves each host once (IPv4 only, so no AAAA lookups)
+        connector = aiohttp.TCPConnector(
+            limit=250,
+            limit_per_host=250,
+            use_dns_cache=True,
+            ttl_dns_cache=300,
+            family=socket.AF_INET,
+            keepalive_timeout=30,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=30),
+            auto_decompress=False,
+            headers={"Accept-Encoding": "identity"},
+        )
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -102,14 +216,14 @@ class PerformanceTester:
                 logger.error(f"❌ Test {test_name} failed: {e}")
                 # Continue with other tests
         
-        # Generate final report
-        self.generate_performance_report()
+        # Generate final report; it writes to disk, so keep it off the event loop
+        await asyncio.get_running_loop().run_in_executor(None, self.generate_performance_report)
         return self.test_results
     
     async def test_basic_endpoints(self):
         """Test basic endpoint performance"""
         metrics = TestMetrics("basic_health_check")
-        metrics.start_time = time.time()
+        metrics.start_time = _now()
         
         endpoints = [
             "/",
@@ -117,51 +231,36 @@ class PerformanceTester:
             "/api/performance",
         ]
         
-        for endpoint in endpoints:
-            for _ in range(10):  # 10 requests per endpoint
-                start_time = time.time()
-                try:
-                    async with self.session.get(f"{self.base_url}{endpoint}") as response:
-                        await response.text()
-                        response_time = time.time() - start_time
-                        
-                        metrics.total_requests += 1
-                        metrics.response_times.append(response_time)
-                        
-                        if response.status == 200:
-                            metrics.successful_requests += 1
-                        else:
-                            metrics.failed_requests += 1
-                            metrics.error_messages.append(f"HTTP {response.status} for {endpoint}")
-                            
-                except Exception as e:
-                    metrics.total_requests += 1
-                    metrics.failed_requests += 1
-                    metrics.error_messages.append(f"Exception for {endpoint}: {str(e)}")
+        # 10 requests per endpoint in one wave; only 200 counts as healthy here
+        tasks = [
+            self._make_request(endpoint, accepted=(200,))
+            for endpoint in endpoints
+            for _ in range(10)
+        ]
+        metrics.record_results(await asyncio.gather(*tasks))
         
-        metrics.end_time = time.time()
+        metrics.end_time = _now()
+        metrics.finalize()
         self.test_results["basic_health_check"] = metrics
     
     async def test_models_endpoint_load(self):
         """Test models endpoint under load"""
         metrics = TestMetrics("load_models_performance")
-        metrics.start_time = time.time()
+        metrics.start_time = _now()
         
         # Concurrent requests to models endpoint
-        tasks = []
-        for _ in range(50):  # 50 concurrent requests
-            task = self._make_request("/api/models", metrics)
-            tasks.append(task)
-        
-        await asyncio.gather(*tasks, return_exceptions=True)
+        metrics.record_results(
+            await run_bounded(lambda: self._make_request("/api/models"), n=50, concurrency=50)
+        )
         
-        metrics.end_time = time.time()
+        metrics.end_time = _now()
+        metrics.finalize()
         self.test_results["load_models_performance"] = metrics
     
     async def test_file_upload_performance(self):
         """Test file upload performance with various sizes"""
         metrics = TestMetrics("file_upload_performance")
-        metrics.start_time = time.time()
+        metrics.start_time = _now()
         
         # Create test files of different sizes
         test_files = [
@@ -171,20 +270,23 @@ class PerformanceTester:
             (5 * 1024 * 1024, "xlarge_5mb.jpg"),  # 5MB
         ]
         
-        for file_size, filename in test_files:
-            # Create fake JPEG data
-            jpeg_header = b'\\xff\\xd8\\xff\\xe0\\x00\\x10JFIF'
-            fake_data = jpeg_header + b'\\x00' * (file_size - len(jpeg_header))
-            
+        # Build each fake JPEG body once; aiohttp writes a Payload as-is instead of re-wrapping the bytes
+        jpeg_header = b'\xff\xd8\xff\xe0\x00\x10JFIF'
+        payloads = [
+            (aiohttp.BytesPayload(jpeg_header + bytes(file_size - len(jpeg_header)), content_type='image/jpeg'), filename)
+            for file_size, filename in test_files
+        ]
+        
+        for payload, filename in payloads:
             for attempt in range(3):  # 3 attempts per file size
-                start_time = time.time()
+                start_time = _now()
                 try:
                     data = aiohttp.FormData()
-                    data.add_field('file', fake_data, filename=filename, content_type='image/jpeg')
+                    data.add_field('file', payload, filename=filename, content_type='image/jpeg')
                     
-                    async with self.session.post(f"{self.base_url}/api/upload", data=data) as response:
-                        await response.text()
-                        response_time = time.time() - start_time
+                    async with self.session.post(self._url("/api/upload"), data=data) as response:
+                        await _drain(response)
+                        response_time = _now() - start_time
                         
                         metrics.total_requests += 1
                         metrics.response_times.append(response_time)
@@ -200,27 +302,27 @@ class PerformanceTester:
                     metrics.failed_requests += 1
                     metrics.error_messages.append(f"Upload exception: {str(e)}")
         
-        metrics.end_time = time.time()
+        metrics.end_time = _now()
+        metrics.finalize()
         self.test_results["file_upload_performance"] = metrics
     
     async def test_concurrent_users(self):
         """Simulate concurrent users accessing the application"""
         metrics = TestMetrics("concurrent_users")
-        metrics.start_time = time.time()
-        
-        # Simulate 20 concurrent users, each making 5 requests
-        user_tasks = []
+        metrics.start_time = _now()
         
-        for user_id in range(20):
-            user_task = self._simulate_user_session(user_id, metrics)
-            user_tasks.append(user_task)
+        # Simulate 20 concurrent users, each making 4 requests
+        user_ids = iter(range(20))
+        sessions = await run_bounded(lambda: self._simulate_user_session(next(user_ids)), n=20, concurrency=20)
         
-        await asyncio.gather(*user_tasks, return_exceptions=True)
+        for session_results in sessions:
+            metrics.record_results(session_results)
         
-        metrics.end_time = time.time()
+        metrics.end_time = _now()
+        metrics.finalize()
         self.test_results["concurrent_users"] = metrics
     
-    async def _simulate_user_session(self, user_id: int, metrics: TestMetrics):
+    async def _simulate_user_session(self, user_id: int) -> List[RequestResult]:
         """Simulate a realistic user session"""
         user_actions = [
             "/",
@@ -229,103 +331,86 @@ class PerformanceTester:
             "/api/history",
         ]
         
-        for action in user_actions:
-            await asyncio.sleep(0.5)  # Realistic user think time
-            await self._make_request(action, metrics)
+        # The page loads are independent, so after one think time they go out together
+        await asyncio.sleep(random.uniform(0.05, 0.25))
+        return list(await asyncio.gather(*(self._make_request(action) for action in user_actions)))
     
     async def test_rate_limiting(self):
         """Test rate limiting functionality"""
         metrics = TestMetrics("rate_limiting")
-        metrics.start_time = time.time()
+        metrics.start_time = _now()
         
-        # Rapid requests to trigger rate limiting
-        tasks = []
-        for _ in range(100):  # 100 rapid requests
-            task = self._make_request("/api/models", metrics)
-            tasks.append(task)
-        
-        # Execute all at once to trigger rate limits
-        await asyncio.gather(*tasks, return_exceptions=True)
+        # 100 rapid requests, all in flight at once to trigger rate limits
+        metrics.record_results(
+            await run_bounded(lambda: self._make_request("/api/models"), n=100, concurrency=100)
+        )
         
-        metrics.end_time = time.time()
+        metrics.end_time = _now()
+        metrics.finalize()
         self.test_results["rate_limiting"] = metrics
     
     async def test_memory_stress(self):
         """Test memory usage under stress"""
         metrics = TestMetrics("memory_stress")
-        metrics.start_time = time.time()
+        metrics.start_time = _now()
         
-        # Create multiple concurrent sessions to test memory handling
-        sessions = []
-        try:
-            # Create 50 concurrent sessions
-            for _ in range(50):
-                session = aiohttp.ClientSession()
-                sessions.append(session)
-            
-            # Make requests with all sessions
-            tasks = []
-            for session in sessions:
-                for _ in range(5):  # 5 requests per session
-                    task = self._make_request_with_session(session, "/api/models", metrics)
-                    tasks.append(task)
-            
-            await asyncio.gather(*tasks, return_exceptions=True)
-            
-        finally:
-            # Clean up sessions
-            for session in sessions:
-                await session.close()
+        # Pressure comes from many in-flight requests on the shared pool, not from extra sessions
+        metrics.record_results(
+            await run_bounded(lambda: self._make_request("/api/models"), n=250, concurrency=100)
+        )
         
-        metrics.end_time = time.time()
+        metrics.end_time = _now()
+        metrics.finalize()
         self.test_results["memory_stress"] = metrics
     
     async def test_sustained_load(self):
         """Test sustained load over time"""
         metrics = TestMetrics("sustained_load")
-        metrics.start_time = time.time()
+        metrics.start_time = _now()
         
-        # Run sustained load for 60 seconds
-        end_time = time.time() + 60
+        # Keep exactly 10 requests in flight for 60 seconds, starting a new one as soon as a slot frees up
+        semaphore = asyncio.Semaphore(10)
+        end_time = _now() + 60
         
-        while time.time() < end_time:
-            # Batch of requests every second
-            tasks = []
-            for _ in range(10):  # 10 requests per second
-                task = self._make_request("/api/models", metrics)
-                tasks.append(task)
-            
-            await asyncio.gather(*tasks, return_exceptions=True)
-            await asyncio.sleep(1)  # Wait 1 second before next batch
+        async def one_request():
+            try:
+                return await self._make_request("/api/models")
+            finally:
+                semaphore.release()
         
-        metrics.end_time = time.time()
+        tasks = []
+        while True:
+            await semaphore.acquire()
+            if _now() >= end_time:
+                semaphore.release()
+                break
+            tasks.append(asyncio.create_task(one_request()))
+        
+        metrics.record_results(await asyncio.gather(*tasks))
+        
+        metrics.end_time = _now()
+        metrics.finalize()
         self.test_results["sustained_load"] = metrics
     
-    async def _make_request(self, endpoint: str, metrics: TestMetrics):
-        """Make a single request and record metrics"""
-        return await self._make_request_with_session(self.session, endpoint, metrics)
+    async def _make_request(self, endpoint: str, accepted: Tuple[int, ...] = (200, 429)) -> RequestResult:
+        """Make a single request with the shared session"""
+        return await self._make_request_with_session(self.session, endpoint, accepted)
     
-    async def _make_request_with_session(self, session: aiohttp.ClientSession, endpoint: str, metrics: TestMetrics):
-        """Make a request with a specific session"""
-        start_time = time.time()
+    async def _make_request_with_session(self, session: aiohttp.ClientSession, endpoint: str,
+                                         accepted: Tuple[int, ...] = (200, 429)) -> RequestResult:
+        """Make a request with a specific session; callers fold the result into metrics"""
+        start_time = _now()
         try:
-            async with session.get(f"{self.base_url}{endpoint}") as response:
-                await response.text()
-                response_time = time.time() - start_time
-                
-                metrics.total_requests += 1
-                metrics.response_times.append(response_time)
+            async with session.get(self._url(endpoint)) as response:
+                await _drain(response)
+                response_time = _now() - start_time
                 
-                if response.status in [200, 429]:  # 429 = Rate limited (expected)
-                    metrics.successful_requests += 1
-                else:
-                    metrics.failed_requests += 1
-                    metrics.error_messages.append(f"HTTP {response.status} for {endpoint}")
+                if response.status in accepted:  # 429 = Rate limited (expected by default)
+                    return (response_time, response.status, None)
+                return (response_time, response.status, f"HTTP {response.status} for {endpoint}")
         
         except Exception as e:
-            metrics.total_requests += 1
-            metrics.failed_requests += 1
-            metrics.error_messages.append(f"Exception for {endpoint}: {str(e)}")
+            return (None, None, f"Exception for {endpoint}: {str(e)}")
     
     def generate_performance_report(self):
         """Generate comprehensive performance report"""
@@ -339,22 +424,27 @@ class PerformanceTester:
         }
         
         for test_name, metrics in self.test_results.items():
+            summary = metrics.summarize()
             report["test_results"][test_name] = {
-                "total_requests": metrics.total_requests,
-                "successful_requests": metrics.successful_requests,
-                "failed_requests": metrics.failed_requests,
-                "success_rate": round(metrics.success_rate, 2),
-                "avg_response_time_ms": round(metrics.avg_response_time * 1000, 2),
-                "p95_response_time_ms": round(metrics.p95_response_time * 1000, 2),
-                "requests_per_second": round(metrics.requests_per_second, 2),
-                "total_duration_seconds": round(metrics.total_duration, 2),
-                "error_messages": metrics.error_messages[:5]  # First 5 errors
+                "total_requests": summary["total_requests"],
+                "successful_requests": summary["successful_requests"],
+                "failed_requests": summary["failed_requests"],
+                "success_rate": round(summary["success_rate"], 2),
+                "avg_response_time_ms": round(summary["avg_response_time"] * 1000, 2),
+                "p50_response_time_ms": round(summary["p50_response_time"] * 1000, 2),
+                "p95_response_time_ms": round(summary["p95_response_time"] * 1000, 2),
+                "p99_response_time_ms": round(summary["p99_response_time"] * 1000, 2),
+                "requests_per_second": round(summary["requests_per_second"], 2),
+                "total_duration_seconds": round(summary["total_duration"], 2),
+                "error_messages": list(metrics.error_messages)[:5]  # First 5 retained errors
             }
         
         # Save report to file
         report_path = Path("performance_test_report.json")
-        with open(report_path, 'w') as f:
-            json.dump(report, f, indent=2)
+        if orjson is not None:
+            report_path.write_bytes(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+        else:
+            report_path.write_text(json.dumps(report, indent=2))
         
         logger.info(f"📊 Performance report saved to: {report_path}")
         
@@ -372,7 +462,8 @@ class PerformanceTester:
             print(f"   Requests: {results['total_requests']} total, {results['successful_requests']} successful")
             print(f"   Success Rate: {results['success_rate']}%")
             print(f"   Avg Response Time: {results['avg_response_time_ms']}ms")
-            print(f"   95th Percentile: {results['p95_response_time_ms']}ms")
+            print(f"   Percentiles: p50 {results['p50_response_time_ms']}ms, "
+                  f"p95 {results['p95_response_time_ms']}ms, p99 {results['p99_response_time_ms']}ms")
             print(f"   Throughput: {results['requests_per_second']} req/sec")
             
             if results['error_messages']:
@@ -383,6 +474,10 @@ class PerformanceTester:
 
 async def main():
     """Run performance test suite"""
+    if hasattr(asyncio, "eager_task_factory"):
+        # Python 3.12+: short request coroutines run synchronously until their first real suspension
+        asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
+    
     try:
         async with PerformanceTester() as tester:
             await tester.run_all_tests()
@@ -395,4 +490,5 @@ async def main():
 
 if __name__ == "__main__":
     import sys
-    sys.exit(asyncio.run(main()))
\ No newline at end of file
+    # asyncio.run also shuts down async generators and the default executor (used for the report)
+    sys.exit(asyncio.run(main()))
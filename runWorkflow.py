@@ -1,14 +1,71 @@
 import asyncio
+import logging
+import time
 import fal_client
 
+logger = logging.getLogger(__name__)
+
+# Flush buffered events after this many, or once this many seconds have passed
+FLUSH_EVENTS = 32
+FLUSH_INTERVAL = 0.05
+# Give up if the server sends nothing for this many seconds
+STREAM_IDLE_TIMEOUT = 30
+
 async def stream():
     stream = fal_client.stream_async(
         "workflows/dedkamaroz/image-to-video",
         arguments={},
     )
-    async for event in stream:
-        print(event)
+    # Skip formatting entirely when INFO output is switched off
+    emit = logger.isEnabledFor(logging.INFO)
+    buffer = []
+    last_flush = time.perf_counter()
+
+    def flush():
+        nonlocal last_flush
+        if buffer:
+            logger.info("%s", "\n".join(buffer))
+            buffer.clear()
+        last_flush = time.perf_counter()
+
+    events = stream.__aiter__()
+    # One pending __anext__ is kept across wake-ups: cancelling it would end the stream
+    next_event = None
+    try:
+        idle_deadline = time.perf_counter() + STREAM_IDLE_TIMEOUT
+        next_event = asyncio.ensure_future(events.__anext__())
+        while True:
+            now = time.perf_counter()
+            if now >= idle_deadline:
+                raise asyncio.TimeoutError(f"No stream events for {STREAM_IDLE_TIMEOUT} seconds")
+            # While events are buffered, wake up in time to flush them
+            wake_at = min(idle_deadline, last_flush + FLUSH_INTERVAL) if buffer else idle_deadline
+            done, _ = await asyncio.wait((next_event,), timeout=wake_at - now)
+            if not done:
+                flush()
+                continue
+            try:
+                event = next_event.result()
+            except StopAsyncIteration:
+                break
+            idle_deadline = time.perf_counter() + STREAM_IDLE_TIMEOUT
+            next_event = asyncio.ensure_future(events.__anext__())
+            if not emit:
+                continue
+            buffer.append(str(event))  # Same text print() would write
+            if len(buffer) >= FLUSH_EVENTS or time.perf_counter() - last_flush > FLUSH_INTERVAL:
+                flush()
+    finally:
+        # Buffered events are logged even when the stream fails or times out
+        flush()
+        if next_event is not None and not next_event.done():
+            next_event.cancel()
+            await asyncio.gather(next_event, return_exceptions=True)
+        # Close the upstream stream now, not at garbage collection, on timeout or error
+        await events.aclose()
 
 
 if __name__ == "__main__":
-    asyncio.run(stream())
\ No newline at end of file
+    import sys
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
+    asyncio.run(stream())
@@ -8,66 +8,188 @@ import os
 import re
 import logging
 import hashlib
+import heapq
+import ipaddress
 import secrets
+import sys
 import time
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Callable, Tuple
+from urllib.parse import urlsplit
 from cryptography.fernet import Fernet
-import validators
 import json
-from collections import defaultdict, deque
+from collections import defaultdict
+from functools import lru_cache
+from performance import TTLCache
+try:
+    import re2  # Optional google-re2: linear-time matching, no backtracking
+except ImportError:
+    re2 = None
 
 logger = logging.getLogger(__name__)
 
+# Read once at import; the environment does not change while the process runs
+PRODUCTION = os.getenv('PRODUCTION', 'false').lower() == 'true'
+
+
+def _compile_blacklist(patterns: List[str]):
+    """Compile a case-insensitive, dot-matches-newline alternation, preferring RE2 when it is installed"""
+    pattern = '(?is)' + '|'.join(patterns)
+    if re2 is not None:
+        try:
+            return re2.compile(pattern)
+        except Exception as e:
+            logger.error(f"RE2 could not compile prompt blacklist, falling back to re: {e}")
+    return re.compile(pattern)
+
+
+def _stdin_is_interactive() -> bool:
+    """True if prompting on stdin can get an answer (not a server, CI job or pipe)"""
+    if os.getenv('NONINTERACTIVE'):
+        return False
+    return sys.stdin is not None and sys.stdin.isatty()
+
+
+def _group_by_length(prefixes: Dict[bytes, str]) -> Tuple[Tuple[int, Dict[bytes, str]], ...]:
+    """Group byte prefixes by length (longest first) so each length is one dict lookup"""
+    grouped: Dict[int, Dict[bytes, str]] = defaultdict(dict)
+    for prefix, value in prefixes.items():
+        grouped[len(prefix)][prefix] = value
+    return tuple(sorted(grouped.items(), reverse=True))
+
+
+class RingTimestamps:
+    """Fixed-size circular buffer of request timestamps
+    
+    Capacity is the next power of two >= max_requests so positions wrap with a
+    bitmask; the oldest entry is overwritten instead of popped.
+    """
+    
+    __slots__ = ("buf", "head", "count", "mask")
+    
+    def __init__(self, max_requests: int):
+        size = 1 << max(max_requests - 1, 0).bit_length()
+        self.buf = [0.0] * size
+        self.head = 0
+        self.count = 0
+        self.mask = size - 1
+        
+    def push(self, timestamp: float):
+        self.buf[self.head] = timestamp
+        self.head = (self.head + 1) & self.mask
+        self.count = min(self.count + 1, self.mask + 1)
+        
+    def newest(self) -> float:
+        return self.buf[(self.head - 1) & self.mask]
+        
+    def is_full_in_window(self, max_requests: int, current_time: float, window: int) -> bool:
+        """True if the last max_requests timestamps all fall inside the window"""
+        if self.count < max_requests:
+            return False
+        return current_time - self.buf[(self.head - max_requests) & self.mask] <= window
+
 
 class SecurityRateLimiter:
-    """Advanced rate limiting with memory cleanup"""
+    """Rate limiting with memory cleanup
+    
+    By default each identifier holds a token bucket of up to max_requests
+    tokens that refills at max_requests per window; a request spends one
+    token. With exact_window=True it instead enforces a strict rolling window
+    (at most max_requests in any window seconds), for callers that need those
+    semantics to be auditable. An identifier that goes over its limit is
+    blocked for block_duration seconds; pass 0 to only enforce the limit.
+    """
     
-    def __init__(self, cleanup_interval: int = 300):
-        self.requests = defaultdict(lambda: deque())
-        self.blocked_ips = defaultdict(float)
+    __slots__ = ("exact_window", "block_duration", "buckets", "windows", "_expiry_heap",
+                 "blocked_ips", "cleanup_interval", "last_cleanup")
+    
+    def __init__(self, cleanup_interval: int = 300, exact_window: bool = False,
+                 block_duration: int = 300):
+        self.exact_window = exact_window
+        self.block_duration = block_duration
+        self.buckets: Dict[str, Tuple[float, float]] = {}  # identifier -> (tokens, last_refill)
+        self.windows: Dict[str, RingTimestamps] = {}  # identifier -> recent request times (exact_window)
+        self._expiry_heap: List[Tuple[float, str]] = []  # (earliest possible expiry, identifier)
+        self.blocked_ips: Dict[str, float] = {}  # identifier -> blocked until
         self.cleanup_interval = cleanup_interval
-        self.last_cleanup = time.time()
+        self.last_cleanup = time.monotonic()
         
     def is_rate_limited(self, identifier: str, max_requests: int, window: int) -> bool:
         """Check if identifier is rate limited"""
-        current_time = time.time()
+        current_time = time.monotonic()
         
         # Clean up old entries periodically
         if current_time - self.last_cleanup > self.cleanup_interval:
             self._cleanup(current_time)
             
-        # Check if IP is temporarily blocked
-        if identifier in self.blocked_ips:
-            if current_time < self.blocked_ips[identifier]:
+        # Check if IP is temporarily blocked (one lookup on the common unblocked path)
+        blocked_until = self.blocked_ips.get(identifier)
+        if blocked_until is not None:
+            if current_time < blocked_until:
                 return True
-            else:
-                del self.blocked_ips[identifier]
+            del self.blocked_ips[identifier]
+        
+        # Check rate limit, recording the request if it is allowed
+        if self.exact_window:
+            limited = self._window_full(identifier, max_requests, window, current_time)
+        else:
+            limited = self._bucket_empty(identifier, max_requests, window, current_time)
+            
+        if limited and self.block_duration:
+            # Block IP (5 minutes by default) after exceeding limit
+            self.blocked_ips[identifier] = current_time + self.block_duration
+        return limited
+        
+    def _bucket_empty(self, identifier: str, max_requests: int, window: int, current_time: float) -> bool:
+        """Refill the identifier's bucket and spend a token if one is available"""
+        bucket = self.buckets.get(identifier)
+        if bucket is None:
+            tokens = float(max_requests)
+        else:
+            tokens, last_refill = bucket
+            tokens = min(max_requests, tokens + (current_time - last_refill) * max_requests / window)
+            
+        if tokens < 1:
+            return True
+            
+        if bucket is None:
+            heapq.heappush(self._expiry_heap, (current_time + 3600, identifier))
+        self.buckets[identifier] = (tokens - 1, current_time)
+        return False
         
-        # Clean old requests outside window
-        request_times = self.requests[identifier]
-        while request_times and current_time - request_times[0] > window:
-            request_times.popleft()
+    def _window_full(self, identifier: str, max_requests: int, window: int, current_time: float) -> bool:
+        """Check the identifier's rolling window and record the request if there is room"""
+        ring = self.windows.get(identifier)
+        if ring is None or ring.mask + 1 < max_requests:
+            if ring is None:
+                heapq.heappush(self._expiry_heap, (current_time + 3600, identifier))
+            ring = self.windows[identifier] = RingTimestamps(max_requests)
             
-        # Check rate limit
-        if len(request_times) >= max_requests:
-            # Block IP for 5 minutes after exceeding limit
-            self.blocked_ips[identifier] = current_time + 300
+        if ring.is_full_in_window(max_requests, current_time, window):
             return True
             
-        # Record this request
-        request_times.append(current_time)
+        ring.push(current_time)
         return False
         
     def _cleanup(self, current_time: float):
         """Clean up old entries to prevent memory leaks"""
-        # Remove old request records
-        for identifier in list(self.requests.keys()):
-            request_times = self.requests[identifier]
-            while request_times and current_time - request_times[0] > 3600:  # 1 hour
-                request_times.popleft()
-            if not request_times:
-                del self.requests[identifier]
+        # Drop identifiers idle for an hour; only entries due to expire are visited
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= current_time:
+            _, identifier = heapq.heappop(heap)
+            if identifier in self.buckets:
+                last_seen = self.buckets[identifier][1]
+            elif identifier in self.windows:
+                last_seen = self.windows[identifier].newest()
+            else:
+                continue
+                
+            if last_seen + 3600 <= current_time:
+                self.buckets.pop(identifier, None)
+                self.windows.pop(identifier, None)
+            else:
+                # Still active: check again an hour after its latest request
+                heapq.heappush(heap, (last_seen + 3600, identifier))
                 
         # Remove expired blocks
         expired_blocks = [ip for ip, expire_time in self.blocked_ips.items() 
@@ -78,15 +200,95 @@ class SecurityRateLimiter:
         self.last_cleanup = current_time
 
 
+async def _send_json(send, status: int, body: bytes):
+    """Send a complete JSON response from ASGI middleware"""
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class RateLimitMiddleware:
+    """Plain ASGI middleware applying per-client rolling-window limits by path prefix
+    
+    Only scope["path"] is inspected, so requests to unlimited routes pass
+    straight through. A client over its limit gets 429 until the window has
+    room again; there is no lockout.
+    """
+    
+    _BODY = b'{"detail":"Rate limit exceeded"}'
+    
+    def __init__(self, app, limits: Dict[str, int], window: int = 60):
+        self.app = app
+        self.limits = tuple(limits.items())  # (path prefix, max requests per window)
+        self.window = window
+        self.limiter = SecurityRateLimiter(exact_window=True, block_duration=0)
+        
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            path = scope["path"]
+            for prefix, max_requests in self.limits:
+                if path.startswith(prefix):
+                    client = scope.get("client")
+                    identifier = f"{client[0] if client else 'unknown'}:{prefix}"
+                    if self.limiter.is_rate_limited(identifier, max_requests, self.window):
+                        await _send_json(send, 429, self._BODY)
+                        return
+                    break
+        await self.app(scope, receive, send)
+
+
+class RequestSizeLimitMiddleware:
+    """Plain ASGI middleware rejecting oversized request bodies on given paths
+    
+    The declared Content-Length is checked before anything reads the body, so
+    an oversized upload is refused without being parsed. Other paths pass
+    straight through.
+    """
+    
+    _INVALID_LENGTH = b'{"detail":"Invalid Content-Length header"}'
+    
+    def __init__(self, app, limits: Dict[str, int], detail: str = "Request body too large"):
+        self.app = app
+        self.limits = limits  # exact path -> max body bytes
+        self.too_large = json.dumps({"detail": detail}, separators=(",", ":")).encode()
+        
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            max_size = self.limits.get(scope["path"])
+            if max_size is not None:
+                content_length = next(
+                    (value for name, value in scope["headers"] if name == b"content-length"), b"0"
+                )
+                try:
+                    too_large = int(content_length) > max_size
+                except ValueError:
+                    await _send_json(send, 400, self._INVALID_LENGTH)
+                    return
+                if too_large:
+                    await _send_json(send, 413, self.too_large)
+                    return
+        await self.app(scope, receive, send)
+
+
 class InputValidator:
     """Enhanced input validation and sanitization utilities"""
     
     # File path validation patterns
     SAFE_PATH_PATTERN = re.compile(r'^[a-zA-Z0-9_\-\./\\: ]+$')
+    DANGEROUS_DIR_PATTERN = re.compile(r'/(?:etc|proc|sys|dev|root|home)/', re.IGNORECASE)
+    UNSAFE_FILENAME_CHARS_PATTERN = re.compile(r'[^a-zA-Z0-9._-]')
+    
+    # URL structure checks for validate_url (urlsplit lowercases the hostname)
+    ALLOWED_URL_SCHEMES = frozenset({'http', 'https'})
+    DOMAIN_NAME_PATTERN = re.compile(r'^(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z][a-z0-9-]{0,62}$')
     
     # Enhanced dangerous patterns for prompts
     DANGEROUS_PATTERNS = [
-        r'<script.*?</script>',
+        r'<script\b[^>]*>[\s\S]*?</script>',
         r'javascript:',
         r'vbscript:',
         r'onload=',
@@ -96,17 +298,22 @@ class InputValidator:
         r'import\s+os',
         r'import\s+subprocess',
         r'__import__',
-        r'\${.*}',  # Template injection
-        r'\{\{.*\}\}',  # Template injection
-        r'<\?php.*\?>',  # PHP injection
-        r'<%.*%>',  # ASP/JSP injection
+        r'\$\{[^}]*\}',  # Template injection
+        r'\{\{[\s\S]*?\}\}',  # Template injection
+        r'<\?php[\s\S]*?\?>',  # PHP injection
+        r'<%[\s\S]*?%>',  # ASP/JSP injection
         r'UNION\s+SELECT',  # SQL injection
         r'DROP\s+TABLE',  # SQL injection
-        r'/\*.*\*/',  # SQL comments
-        r'--.*',  # SQL comments
+        r'/\*[\s\S]*?\*/',  # SQL comments
+        r'--',  # SQL comments
     ]
     
-    PROMPT_BLACKLIST = re.compile('|'.join(DANGEROUS_PATTERNS), re.IGNORECASE)
+    PROMPT_BLACKLIST = _compile_blacklist(DANGEROUS_PATTERNS)
+    
+    # Single-pass character counting for prompt heuristics
+    SUSPICIOUS_CHARS_TABLE = str.maketrans('', '', '<>{}$%;|&')
+    # Anything that is neither alphanumeric (\w minus underscore, same as str.isalnum) nor ' .,!?-'
+    SPECIAL_CHAR_PATTERN = re.compile(r'[^\w .,!?-]|_')
     
     # File type validation
     ALLOWED_IMAGE_TYPES = {
@@ -114,6 +321,12 @@ class InputValidator:
         'image/webp', 'image/bmp', 'image/tiff'
     }
     
+    # Valid aspect ratios for video generation
+    VALID_ASPECT_RATIOS = frozenset({
+        "1:1", "4:3", "3:4", "16:9", "9:16",
+        "21:9", "9:21", "2:3", "3:2"
+    })
+    
     MAGIC_NUMBERS = {
         b'\xff\xd8\xff': 'image/jpeg',
         b'\x89PNG\r\n\x1a\n': 'image/png',
@@ -122,6 +335,7 @@ class InputValidator:
         b'RIFF': 'image/webp',  # Needs additional validation
         b'BM': 'image/bmp',
     }
+    MAGIC_BY_LENGTH = _group_by_length(MAGIC_NUMBERS)
     
     @classmethod
     def validate_file_path(cls, path: str) -> bool:
@@ -129,6 +343,10 @@ class InputValidator:
         if not path or len(path) > 1000:  # Reasonable length limit
             return False
             
+        # Validate characters before building a normalized copy
+        if not cls.SAFE_PATH_PATTERN.match(path):
+            return False
+            
         # Normalize path to detect traversal attempts
         normalized = os.path.normpath(path)
         
@@ -136,13 +354,8 @@ class InputValidator:
         if '..' in normalized or normalized.startswith('/') and not normalized.startswith('/tmp/'):
             return False
             
-        # Additional security checks
-        dangerous_patterns = ['/etc/', '/proc/', '/sys/', '/dev/', '/root/', '/home/']
-        if any(dangerous in normalized.lower() for dangerous in dangerous_patterns):
-            return False
-            
-        # Validate characters
-        if not cls.SAFE_PATH_PATTERN.match(path):
+        # Additional security checks (case-insensitive regex, no lowercased copy)
+        if cls.DANGEROUS_DIR_PATTERN.search(normalized):
             return False
             
         return True
@@ -163,7 +376,7 @@ class InputValidator:
             return None
             
         # Check if file exists
-        if not Path(path).exists():
+        if not os.path.exists(path):
             logger.warning(f"File not found: {path}")
             return None
             
@@ -175,20 +388,20 @@ class InputValidator:
         if not prompt or len(prompt) > 2000:  # Stricter length limit
             return False
             
-        # Check for dangerous patterns
-        if cls.PROMPT_BLACKLIST.search(prompt):
-            return False
-            
-        # Additional checks for suspicious patterns
-        suspicious_chars = ['<', '>', '{', '}', '$', '%', ';', '|', '&']
-        if sum(prompt.count(char) for char in suspicious_chars) > 10:
+        # Cheapest checks first so obviously bad prompts never reach the blacklist regex
+        suspicious_count = len(prompt) - len(prompt.translate(cls.SUSPICIOUS_CHARS_TABLE))
+        if suspicious_count > 10:
             return False
             
         # Check for excessive special characters
-        special_char_ratio = sum(1 for c in prompt if not c.isalnum() and c not in ' .,!?-') / len(prompt)
+        special_char_ratio = cls.SPECIAL_CHAR_PATTERN.subn('', prompt)[1] / len(prompt)
         if special_char_ratio > 0.3:  # More than 30% special chars
             return False
             
+        # Check for dangerous patterns
+        if cls.PROMPT_BLACKLIST.search(prompt):
+            return False
+            
         return True
     
     @classmethod
@@ -207,6 +420,18 @@ class InputValidator:
             
         return prompt
     
+    @classmethod
+    def is_repetitive(cls, prompt: str) -> bool:
+        """Check whether fewer than half of the prompt's words are unique"""
+        words = prompt.split()
+        threshold = len(words) * 0.5
+        seen = set()
+        for word in words:
+            seen.add(word)
+            if len(seen) >= threshold:
+                return False  # Enough unique words already, skip the rest
+        return len(seen) < threshold
+        
     @classmethod
     def validate_duration(cls, duration: Any) -> Optional[int]:
         """Validate and sanitize duration input"""
@@ -231,13 +456,7 @@ class InputValidator:
             
         ratio = ratio.strip()
         
-        # Valid aspect ratios for video generation
-        valid_ratios = [
-            "1:1", "4:3", "3:4", "16:9", "9:16", 
-            "21:9", "9:21", "2:3", "3:2"
-        ]
-        
-        if ratio in valid_ratios:
+        if ratio in cls.VALID_ASPECT_RATIOS:
             return ratio
             
         logger.warning(f"Invalid aspect ratio: {ratio}")
@@ -265,27 +484,35 @@ class InputValidator:
         if not url or len(url) > 2000:
             return False
             
-        # Basic URL validation
-        if not validators.url(url):
+        # Basic URL validation: http(s) scheme and a well-formed host
+        try:
+            parts = urlsplit(url)
+            hostname = parts.hostname
+            parts.port  # Raises ValueError for a malformed port
+        except ValueError:
             return False
-            
-        # Additional security checks
-        parsed_url = url.lower()
-        
-        # Block local/private addresses
-        blocked_patterns = [
-            'localhost', '127.0.0.1', '0.0.0.0', '::1',
-            '192.168.', '10.', '172.16.', '172.17.', '172.18.', '172.19.',
-            '172.20.', '172.21.', '172.22.', '172.23.', '172.24.', '172.25.',
-            '172.26.', '172.27.', '172.28.', '172.29.', '172.30.', '172.31.',
-            'file://', 'ftp://', 'ftps://'
-        ]
-        
-        if any(pattern in parsed_url for pattern in blocked_patterns):
+        if parts.scheme not in cls.ALLOWED_URL_SCHEMES or not hostname:
+            return False
+        if any(c.isspace() for c in url):
             return False
             
+        # Block local/private addresses: IP literals by range, names by the localhost domain
+        try:
+            ip = ipaddress.ip_address(hostname)
+        except ValueError:
+            ip = None
+        if ip is None:
+            if not cls.DOMAIN_NAME_PATTERN.match(hostname) or hostname.endswith('.localhost'):
+                return False
+        else:
+            if ip.version == 6 and ip.ipv4_mapped:
+                ip = ip.ipv4_mapped
+            if (ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved
+                    or ip.is_unspecified or ip.is_multicast):
+                return False
+            
         # Must be HTTPS in production
-        if os.getenv('PRODUCTION', 'false').lower() == 'true' and not parsed_url.startswith('https://'):
+        if PRODUCTION and url[:8].lower() != 'https://':
             return False
             
         return True
@@ -296,14 +523,17 @@ class InputValidator:
         if not content or len(content) < 8:
             return False
             
-        # Check magic numbers
-        for magic, file_type in cls.MAGIC_NUMBERS.items():
-            if content.startswith(magic):
-                if file_type == declared_type:
-                    return True
-                if file_type == 'image/webp' and declared_type == 'image/webp':
-                    # Additional WebP validation
-                    return b'WEBP' in content[:12]
+        # Check magic numbers: one dict lookup per distinct prefix length
+        for length, magics in cls.MAGIC_BY_LENGTH:
+            file_type = magics.get(content[:length])
+            if file_type is None:
+                continue
+            if file_type != declared_type:
+                return False
+            if file_type == 'image/webp':
+                # RIFF is shared with other formats; WebP has its tag at bytes 8-12
+                return content[8:12] == b'WEBP'
+            return True
                     
         return False
     
@@ -311,40 +541,57 @@ class InputValidator:
     def generate_secure_filename(cls, original_filename: str, user_id: str = None) -> str:
         """Generate secure filename with hash"""
         # Extract extension safely
-        safe_name = re.sub(r'[^a-zA-Z0-9._-]', '', original_filename)
+        safe_name = cls.UNSAFE_FILENAME_CHARS_PATTERN.sub('', original_filename)
         name, ext = os.path.splitext(safe_name)
         
         # Generate unique hash
         timestamp = str(int(time.time()))
         user_part = user_id or 'anonymous'
         hash_input = f"{name}{timestamp}{user_part}{secrets.token_hex(8)}"
-        file_hash = hashlib.sha256(hash_input.encode()).hexdigest()[:16]
+        file_hash = hashlib.blake2b(hash_input.encode(), digest_size=8).hexdigest()  # 16 hex chars
         
         return f"{file_hash}{ext.lower()}"
 
 
+@lru_cache(maxsize=8)
+def _load_or_create_key(key_path: str) -> bytes:
+    """Read the key file at an absolute path, creating it on first use (cached per path)"""
+    path = Path(key_path)
+    
+    if path.exists():
+        with open(path, 'rb') as f:
+            return f.read()
+    else:
+        key = Fernet.generate_key()
+        with open(path, 'wb') as f:
+            f.write(key)
+        # Make key file read-only
+        os.chmod(path, 0o600)
+        return key
+
+
+@lru_cache(maxsize=8)
+def _get_cipher(key: bytes) -> Fernet:
+    """Fernet cipher for a key, built once per key"""
+    return Fernet(key)
+
+
 class SecureConfig:
     """Secure configuration management"""
     
-    def __init__(self, config_path: str = "./config/settings.json"):
+    API_KEY_PATTERN = re.compile(r'[a-zA-Z0-9\-:_]+')
+    
+    def __init__(self, config_path: str = "./config/settings.json", base_dir: Optional[str] = None):
         self.config_path = Path(config_path)
+        # Key and stored API key live under base_dir; by default the working directory
+        self.base_dir = Path(base_dir) if base_dir is not None else Path(".")
         self.encryption_key = self._get_or_create_key()
-        self.cipher = Fernet(self.encryption_key)
+        self.cipher = _get_cipher(self.encryption_key)
         
     def _get_or_create_key(self) -> bytes:
         """Get or create encryption key for sensitive data"""
-        key_path = Path("./.encryption_key")
-        
-        if key_path.exists():
-            with open(key_path, 'rb') as f:
-                return f.read()
-        else:
-            key = Fernet.generate_key()
-            with open(key_path, 'wb') as f:
-                f.write(key)
-            # Make key file read-only
-            os.chmod(key_path, 0o600)
-            return key
+        # The key is fixed for the life of the process, so it is read from disk once per location
+        return _load_or_create_key(str((self.base_dir / ".encryption_key").resolve()))
     
     def encrypt_sensitive_data(self, data: str) -> str:
         """Encrypt sensitive data"""
@@ -365,7 +612,7 @@ class SecureConfig:
             return api_key
         
         # 2. Try encrypted config file
-        encrypted_key_path = Path("./config/encrypted_api_key")
+        encrypted_key_path = self.base_dir / "config" / "encrypted_api_key"
         if encrypted_key_path.exists():
             try:
                 with open(encrypted_key_path, 'r') as f:
@@ -376,7 +623,10 @@ class SecureConfig:
             except Exception as e:
                 logger.error(f"Failed to decrypt API key: {e}")
         
-        # 3. Prompt user and store securely
+        # 3. Prompt user and store securely; without a terminal input() would block forever
+        if not _stdin_is_interactive():
+            raise ValueError("FAL_KEY is not configured and stdin is not interactive")
+            
         while True:
             api_key = input("Enter your FAL API key (will be stored securely): ").strip()
             
@@ -385,7 +635,7 @@ class SecureConfig:
                 continue
                 
             # Basic validation
-            if len(api_key) < 10 or not re.match(r'^[a-zA-Z0-9\-:_]+$', api_key):
+            if len(api_key) < 10 or not self.API_KEY_PATTERN.fullmatch(api_key):
                 print("Invalid API key format. Please check and try again.")
                 continue
                 
@@ -403,15 +653,36 @@ class SecureConfig:
                 return api_key  # Return but don't store if encryption fails
 
 
+class FailedAttemptCounter(TTLCache):
+    """Bounded failed-attempt counts: a count expires ttl seconds after its last increment"""
+    
+    def increment(self, identifier: str) -> int:
+        count = self.get(identifier, 0) + 1
+        self[identifier] = count
+        return count
+
+
 class SecurityManager:
     """Enhanced central security management"""
     
-    def __init__(self):
+    # input name -> (validator, failed-attempt label or None, error message)
+    _INPUT_RULES = {
+        'image_path': (InputValidator.sanitize_file_path, "file_validation", "Invalid or missing image file"),
+        'tail_image_path': (InputValidator.sanitize_file_path, None, "Invalid tail image file"),
+        'prompt': (InputValidator.sanitize_prompt, "prompt_validation", "Invalid or dangerous prompt content"),
+        'negative_prompt': (InputValidator.sanitize_prompt, None, "Invalid negative prompt content"),
+        'duration': (InputValidator.validate_duration, None, "Invalid duration (must be 1-60 seconds)"),
+        'cfg_scale': (InputValidator.validate_cfg_scale, None, "Invalid CFG scale (must be 0.0-1.0)"),
+        'aspect_ratio': (InputValidator.validate_aspect_ratio, None, "Invalid aspect ratio"),
+    }
+    # Inputs that are skipped rather than rejected when left empty
+    _OPTIONAL_INPUTS = frozenset({'tail_image_path', 'negative_prompt', 'cfg_scale'})
+    
+    def __init__(self, base_dir: Optional[str] = None):
         self.validator = InputValidator()
-        self.config = SecureConfig()
+        self.config = SecureConfig(base_dir=base_dir)
         self.rate_limiter = SecurityRateLimiter()
-        self.failed_attempts = defaultdict(int)
-        self.last_failed_attempt = defaultdict(float)
+        self.failed_attempts = FailedAttemptCounter(maxsize=100_000, ttl=3600)
         
     def check_rate_limit(self, identifier: str, max_requests: int = 60, window: int = 60) -> bool:
         """Check if request should be rate limited"""
@@ -419,88 +690,99 @@ class SecurityManager:
         
     def log_failed_attempt(self, identifier: str):
         """Log failed authentication/validation attempt"""
-        current_time = time.time()
-        
-        # Reset counter if more than 1 hour since last attempt
-        if current_time - self.last_failed_attempt[identifier] > 3600:
-            self.failed_attempts[identifier] = 0
-            
-        self.failed_attempts[identifier] += 1
-        self.last_failed_attempt[identifier] = current_time
+        # Counts reset once an identifier has been quiet for the TTL (1 hour)
+        attempts = self.failed_attempts.increment(identifier)
         
         # Log suspicious activity
-        if self.failed_attempts[identifier] > 5:
-            logger.warning(f"Multiple failed attempts from {identifier}: {self.failed_attempts[identifier]}")
+        if attempts > 5:
+            logger.warning(f"Multiple failed attempts from {identifier}: {attempts}")
             
     def is_suspicious_activity(self, identifier: str) -> bool:
         """Check if identifier shows suspicious activity patterns"""
         return self.failed_attempts.get(identifier, 0) > 10
         
-    def validate_and_sanitize_inputs(self, **kwargs) -> Dict[str, Any]:
-        """Validate and sanitize all inputs"""
-        validated = {}
+    def _apply_rule(self, value: Any, rule: Tuple[Callable[[Any], Any], Optional[str], str]) -> Any:
+        """Run one _INPUT_RULES entry, logging and raising when the value is rejected"""
+        check, failure_label, error = rule
+        result = check(value)
+        if result is None:
+            if failure_label:
+                self.log_failed_attempt(failure_label)
+            raise ValueError(error)
+        return result
         
-        # Enhanced file path validation
-        if 'image_path' in kwargs:
-            validated['image_path'] = self.validator.sanitize_file_path(kwargs['image_path'])
-            if validated['image_path'] is None:
-                self.log_failed_attempt("file_validation")
-                raise ValueError("Invalid or missing image file")
-                
-            # Additional file content validation if available
-            if 'file_content' in kwargs and 'content_type' in kwargs:
-                if not self.validator.validate_file_content(kwargs['file_content'], kwargs['content_type']):
-                    self.log_failed_attempt("file_content")
-                    raise ValueError("File content does not match declared type")
-                
-        if 'tail_image_path' in kwargs and kwargs['tail_image_path']:
-            validated['tail_image_path'] = self.validator.sanitize_file_path(kwargs['tail_image_path'])
-            if validated['tail_image_path'] is None:
-                raise ValueError("Invalid tail image file")
-        
-        # Enhanced prompt validation
-        if 'prompt' in kwargs:
-            validated['prompt'] = self.validator.sanitize_prompt(kwargs['prompt'])
-            if validated['prompt'] is None:
-                self.log_failed_attempt("prompt_validation")
-                raise ValueError("Invalid or dangerous prompt content")
-                
-            # Additional prompt security checks
+    def _check_validated(self, validated: Dict[str, Any], inputs: Dict[str, Any]):
+        """Checks that need the sanitized values (and, for file content, the raw inputs)"""
+        # Additional file content validation if available
+        if 'image_path' in validated and 'file_content' in inputs and 'content_type' in inputs:
+            if not self.validator.validate_file_content(inputs['file_content'], inputs['content_type']):
+                self.log_failed_attempt("file_content")
+                raise ValueError("File content does not match declared type")
+        
+        # Additional prompt security checks
+        if 'prompt' in validated:
             if len(validated['prompt']) < 10:
                 raise ValueError("Prompt too short (minimum 10 characters)")
                 
             # Check for repetitive patterns (potential spam)
-            words = validated['prompt'].split()
-            if len(set(words)) < len(words) * 0.5:  # Less than 50% unique words
+            if self.validator.is_repetitive(validated['prompt']):
                 self.log_failed_attempt("prompt_spam")
                 raise ValueError("Prompt appears to be spam or repetitive")
         
-        if 'negative_prompt' in kwargs and kwargs['negative_prompt']:
-            validated['negative_prompt'] = self.validator.sanitize_prompt(kwargs['negative_prompt'])
-            if validated['negative_prompt'] is None:
-                raise ValueError("Invalid negative prompt content")
-        
-        # Numeric validation
-        if 'duration' in kwargs:
-            validated['duration'] = self.validator.validate_duration(kwargs['duration'])
-            if validated['duration'] is None:
-                raise ValueError("Invalid duration (must be 1-60 seconds)")
+    def validate_and_sanitize_inputs(self, **kwargs) -> Dict[str, Any]:
+        """Validate and sanitize all inputs"""
+        validated = {}
         
-        if 'cfg_scale' in kwargs and kwargs['cfg_scale'] is not None:
-            validated['cfg_scale'] = self.validator.validate_cfg_scale(kwargs['cfg_scale'])
-            if validated['cfg_scale'] is None:
-                raise ValueError("Invalid CFG scale (must be 0.0-1.0)")
+        # One pass over the supplied inputs; unknown keys (e.g. file_content) are ignored
+        for key, value in kwargs.items():
+            rule = self._INPUT_RULES.get(key)
+            if rule is None or (key in self._OPTIONAL_INPUTS and value in (None, '')):
+                continue
+            validated[key] = self._apply_rule(value, rule)
         
-        # Aspect ratio validation
-        if 'aspect_ratio' in kwargs:
-            validated['aspect_ratio'] = self.validator.validate_aspect_ratio(kwargs['aspect_ratio'])
-            if validated['aspect_ratio'] is None:
-                raise ValueError("Invalid aspect ratio")
+        self._check_validated(validated, kwargs)
         
         # Log successful validation
         logger.info(f"Successfully validated inputs: {list(validated.keys())}")
         return validated
     
+    def compile_validator(self, model_spec: Any) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+        """Build a validator specialised for one model.
+        
+        Applies _INPUT_RULES like validate_and_sanitize_inputs, but every rule is
+        checked (the required inputs must be present) and durations are capped
+        at the model's max_duration when the spec declares one.
+        """
+        spec = model_spec if isinstance(model_spec, dict) else {}
+        max_duration = min(int(spec.get("max_duration", 60)), 60)
+        
+        rules = dict(self._INPUT_RULES)
+        if max_duration < 60:
+            validate_duration = rules['duration'][0]
+            
+            def capped_duration(value: Any) -> Optional[int]:
+                duration = validate_duration(value)
+                return duration if duration is not None and duration <= max_duration else None
+            
+            rules['duration'] = (capped_duration, None, f"Invalid duration (must be 1-{max_duration} seconds)")
+        
+        # Resolved once here instead of on every request
+        rule_items = tuple((key, rule, key in self._OPTIONAL_INPUTS) for key, rule in rules.items())
+        apply_rule = self._apply_rule
+        check_validated = self._check_validated
+        
+        def validate(inputs: Dict[str, Any]) -> Dict[str, Any]:
+            validated = {}
+            for key, rule, optional in rule_items:
+                value = inputs.get(key)
+                if optional and value in (None, ''):
+                    continue
+                validated[key] = apply_rule(value, rule)
+            check_validated(validated, inputs)
+            return validated
+        
+        return validate
+    
     def get_secure_api_key(self) -> str:
         """Get API key securely"""
         api_key = self.config.get_api_key_secure()
@@ -509,5 +791,15 @@ class SecurityManager:
         return api_key
 
 
-# Global security manager instance
-security_manager = SecurityManager()
\ No newline at end of file
+@lru_cache(maxsize=None)
+def get_security_manager() -> SecurityManager:
+    """Shared SecurityManager, created on first use so importing this module
+    does not touch the encryption key"""
+    return SecurityManager()
+
+
+def __getattr__(name: str):
+    # Keep "from security import security_manager" working without eager construction
+    if name == "security_manager":
+        return get_security_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Shared fixtures for the FAL.AI Video Generator test suite
+"""
+
+import pytest
+
+
+def pytest_configure(config):
+    # Registered here too so the mark is known when pytest-xdist is not installed
+    config.addinivalue_line("markers", "xdist_group(name): run all tests of the group on one xdist worker")
+
+
+@pytest.fixture(scope="session")
+def sample_jpg(tmp_path_factory):
+    """Path to a fake JPEG written once per session (contents are never decoded)"""
+    path = tmp_path_factory.mktemp("imgs") / "sample.jpg"
+    path.write_bytes(b"test image data")
+    return str(path)
+
+
+class _ListAsyncIter:
+    """Async iterator over an in-memory list, without async generator frames"""
+    __slots__ = ("_it",)
+
+    def __init__(self, items):
+        self._it = iter(items)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._it)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+@pytest.fixture(scope="session")
+def list_async_iter():
+    """Factory for async iterators over a list, standing in for fal event streams"""
+    return _ListAsyncIter
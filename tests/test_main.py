@@ -6,10 +6,9 @@ Test suite for FAL.AI Video Generator
 import pytest
 import asyncio
 import json
-import tempfile
 import os
 from pathlib import Path
-from unittest.mock import Mock, patch, AsyncMock
+from unittest.mock import patch, AsyncMock
 
 # Add parent directory to path for imports
 import sys
@@ -23,19 +22,19 @@ from security import security_manager, InputValidator
 # ========================================================================
 
 @pytest.fixture
-def temp_config_dir():
+def temp_config_dir(tmp_path):
     """Create temporary directory for test configuration"""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        yield Path(temp_dir)
+    return tmp_path
 
-@pytest.fixture
-def test_config(temp_config_dir):
-    """Create test configuration"""
-    config_file = temp_config_dir / "test_settings.json"
+@pytest.fixture(scope="session")
+def test_config(tmp_path_factory):
+    """Create test configuration (written once per session)"""
+    config_dir = tmp_path_factory.mktemp("cfg")
+    config_file = config_dir / "test_settings.json"
     test_settings = {
         "fal_api_key": "test_key",
         "default_model": "test_model",
-        "output_directory": str(temp_config_dir / "outputs"),
+        "output_directory": str(config_dir / "outputs"),
         "log_level": "DEBUG",
         "max_duration": 5,
         "default_aspect_ratio": "16:9"
@@ -44,16 +43,33 @@ def test_config(temp_config_dir):
     config_file.write_text(json.dumps(test_settings, indent=2))
     return Config(str(config_file))
 
-@pytest.fixture
+def configure_fal_client_mock(mock):
+    """Give the fal_client mock its default responses"""
+    mock.upload_file.return_value = "https://test.url/file.jpg"
+    mock.subscribe.return_value = {"video_url": "https://test.url/video.mp4"}
+    mock.submit_async.return_value = AsyncMock()
+    mock.stream_async.return_value = AsyncMock()
+
+@pytest.fixture(scope="session")
 def mock_fal_client():
-    """Mock fal_client for testing"""
+    """Mock fal_client for testing (one mock shared by the session)"""
     with patch('main.fal_client') as mock:
-        mock.upload_file.return_value = "https://test.url/file.jpg"
-        mock.subscribe.return_value = {"video_url": "https://test.url/video.mp4"}
-        mock.submit_async.return_value = AsyncMock()
-        mock.stream_async.return_value = AsyncMock()
+        configure_fal_client_mock(mock)
         yield mock
 
+@pytest.fixture(scope="class")
+def generator(test_config):
+    """VideoGenerator shared by the tests of one class"""
+    return VideoGenerator(test_config)
+
+@pytest.fixture(autouse=True)
+def _reset_mocks(request):
+    """Return the shared fal_client mock to its initial state before each test"""
+    if "mock_fal_client" in request.fixturenames:
+        mock = request.getfixturevalue("mock_fal_client")
+        mock.reset_mock(return_value=True, side_effect=True)
+        configure_fal_client_mock(mock)
+
 # ========================================================================
 #                            Configuration Tests                          
 # ========================================================================
@@ -81,16 +97,20 @@ class TestConfig:
         assert test_config.get("nonexistent_key", "default") == "default"
         assert test_config.get("fal_api_key", "default") == "test_key"
     
-    @patch.dict(os.environ, {"FAL_KEY": "env_key"})
-    def test_api_key_from_env(self, test_config):
+    def test_api_key_from_env(self, test_config, monkeypatch):
         """Test API key loading from environment"""
+        monkeypatch.setenv("FAL_KEY", "env_key")
         result = test_config.set_api_key()
         assert result is True
         assert os.environ.get("FAL_KEY") == "env_key"
     
     @patch('security.security_manager.get_secure_api_key', return_value='user_input_key')
-    def test_api_key_from_input(self, mock_get_key, temp_config_dir):
+    def test_api_key_from_input(self, mock_get_key, temp_config_dir, monkeypatch):
         """Test API key input from user"""
+        # set_api_key exports FAL_KEY. Set it first so monkeypatch records the
+        # original state and restores it at teardown, then start without one
+        monkeypatch.setenv("FAL_KEY", "placeholder")
+        monkeypatch.delenv("FAL_KEY")
         config_file = temp_config_dir / "test_config.json"
         config = Config(str(config_file))
         
@@ -105,104 +125,80 @@ class TestConfig:
 class TestVideoGenerator:
     """Test video generation functionality"""
     
-    def test_generator_initialization(self, test_config):
-        """Test video generator initialization"""
-        generator = VideoGenerator(test_config)
-        
+    def test_initialization(self, generator, test_config):
+        """Test video generator and CLI initialization"""
         output_dir = Path(test_config.get("output_directory"))
         assert output_dir.exists()
+        
+        cli = InteractiveCLI(generator)
+        assert cli.generator == generator
     
-    def test_upload_file(self, test_config, mock_fal_client):
+    def test_upload_file(self, generator, mock_fal_client, sample_jpg):
         """Test file upload functionality"""
-        generator = VideoGenerator(test_config)
-        
-        # Create test file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as f:
-            f.write(b"test image data")
-            test_file = f.name
-        
-        try:
-            url = generator.upload_file(test_file)
-            assert url == "https://test.url/file.jpg"
-            mock_fal_client.upload_file.assert_called_once_with(test_file)
-        finally:
-            os.unlink(test_file)
+        url = generator.upload_file(sample_jpg)
+        assert url == "https://test.url/file.jpg"
+        mock_fal_client.upload_file.assert_called_once_with(sample_jpg)
     
-    def test_upload_file_error(self, test_config, mock_fal_client):
+    def test_upload_file_error(self, generator, mock_fal_client):
         """Test file upload error handling"""
         mock_fal_client.upload_file.side_effect = Exception("Upload failed")
-        generator = VideoGenerator(test_config)
         
         with pytest.raises(Exception, match="Upload failed"):
             generator.upload_file("nonexistent.jpg")
     
     @pytest.mark.asyncio
-    async def test_generate_kling_pro(self, test_config, mock_fal_client):
+    @pytest.mark.parametrize("prompt, duration, aspect_ratio", [
+        ("test prompt", 10, "9:16"),
+        ("A beautiful landscape video", 5, "16:9"),
+    ])
+    async def test_generate_kling_pro(self, generator, mock_fal_client, sample_jpg,
+                                      prompt, duration, aspect_ratio):
         """Test Kling Pro video generation"""
-        generator = VideoGenerator(test_config)
-        
-        # Create test image file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as f:
-            f.write(b"test image data")
-            test_file = f.name
+        result = await generator.generate_kling_pro(
+            sample_jpg, 
+            prompt,
+            duration=duration,
+            aspect_ratio=aspect_ratio
+        )
         
-        try:
-            result = await generator.generate_kling_pro(
-                test_file, 
-                "test prompt",
-                duration=10,
-                aspect_ratio="9:16"
-            )
-            
-            assert result == {"video_url": "https://test.url/video.mp4"}
-            mock_fal_client.upload_file.assert_called_with(test_file)
-            mock_fal_client.subscribe.assert_called_once()
-        finally:
-            os.unlink(test_file)
+        assert result == {"video_url": "https://test.url/video.mp4"}
+        mock_fal_client.upload_file.assert_called_with(sample_jpg)
+        mock_fal_client.subscribe.assert_called_once()
     
     @pytest.mark.asyncio
-    async def test_generate_kling_v16(self, test_config, mock_fal_client):
+    async def test_generate_kling_v16(self, generator, mock_fal_client, sample_jpg, list_async_iter):
         """Test Kling v1.6 async video generation"""
         # Setup async mock
         async def mock_submit_async(*args, **kwargs):
             mock_handler = AsyncMock()
-            mock_handler.iter_events = Mock(return_value=async_iter([{"event": "progress"}]))
-            mock_handler.get = AsyncMock(return_value={"video_url": "https://test.url/video.mp4"})
+            # A fresh iterator per call, so iterating the events twice also works
+            mock_handler.iter_events = lambda **kwargs: list_async_iter([{"event": "progress"}])
+            async def get(*args, **kwargs):
+                return {"video_url": "https://test.url/video.mp4"}
+            mock_handler.get = get
             return mock_handler
         
         mock_fal_client.submit_async.side_effect = mock_submit_async
         
-        generator = VideoGenerator(test_config)
-        
-        # Create test image file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as f:
-            f.write(b"test image data")
-            test_file = f.name
+        result = await generator.generate_kling_v16(
+            sample_jpg,
+            "test prompt",
+            duration=5
+        )
         
-        try:
-            result = await generator.generate_kling_v16(
-                test_file,
-                "test prompt",
-                duration=5
-            )
-            
-            assert result == {"video_url": "https://test.url/video.mp4"}
-            mock_fal_client.upload_file.assert_called_with(test_file)
-            mock_fal_client.submit_async.assert_called_once()
-        finally:
-            os.unlink(test_file)
+        assert result == {"video_url": "https://test.url/video.mp4"}
+        mock_fal_client.upload_file.assert_called_with(sample_jpg)
+        mock_fal_client.submit_async.assert_called_once()
     
     @pytest.mark.asyncio
-    async def test_run_workflow(self, test_config, mock_fal_client):
+    async def test_run_workflow(self, generator, mock_fal_client, list_async_iter):
         """Test custom workflow execution"""
-        mock_fal_client.stream_async.return_value = async_iter([
+        mock_fal_client.stream_async.return_value = list_async_iter([
             {"event": "start"},
             {"event": "progress", "data": "50%"},
             {"event": "complete"}
         ])
         
-        generator = VideoGenerator(test_config)
-        
         result = await generator.run_workflow(arguments={"test": "data"})
         
         assert "events" in result
@@ -216,50 +212,28 @@ class TestVideoGenerator:
 class TestInteractiveCLI:
     """Test interactive command line interface"""
     
-    def test_cli_initialization(self, test_config):
-        """Test CLI initialization"""
-        generator = VideoGenerator(test_config)
-        cli = InteractiveCLI(generator)
-        
-        assert cli.generator == generator
-    
     @patch('builtins.input', return_value='test.jpg')
-    def test_get_file_path_existing(self, mock_input, test_config):
+    def test_get_file_path_existing(self, mock_input, generator, tmp_path):
         """Test getting existing file path"""
-        generator = VideoGenerator(test_config)
         cli = InteractiveCLI(generator)
         
         # Create test file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as f:
-            test_file = f.name
+        test_path = tmp_path / "existing.jpg"
+        test_path.write_bytes(b"")
+        test_file = str(test_path)
         
-        try:
-            with patch('builtins.input', return_value=test_file):
-                result = cli.get_file_path("Enter file")
-                assert result == test_file
-        finally:
-            os.unlink(test_file)
+        with patch('builtins.input', return_value=test_file):
+            result = cli.get_file_path("Enter file")
+            assert result == test_file
     
     @patch('builtins.input', side_effect=['nonexistent.jpg', ''])
-    def test_get_file_path_nonexistent(self, mock_input, test_config, capsys):
+    def test_get_file_path_nonexistent(self, mock_input, generator):
         """Test handling of nonexistent file path"""
-        generator = VideoGenerator(test_config)
         cli = InteractiveCLI(generator)
         
         result = cli.get_file_path("Enter file")
         assert result is None
-        
-        captured = capsys.readouterr()
-        assert "Invalid or unsafe file path" in captured.out
-
-# ========================================================================
-#                              Utilities                                  
-# ========================================================================
-
-async def async_iter(items):
-    """Helper to create async iterator from list"""
-    for item in items:
-        yield item
+        assert cli.last_error == "invalid_path"
 
 # ========================================================================
 #                           Integration Tests                             
@@ -284,32 +258,6 @@ class TestIntegration:
         # Test CLI initialization
         cli = InteractiveCLI(generator)
         assert cli.generator == generator
-    
-    @pytest.mark.asyncio
-    async def test_end_to_end_mock(self, test_config, mock_fal_client):
-        """Test end-to-end workflow with mocked FAL client"""
-        generator = VideoGenerator(test_config)
-        
-        # Create test image
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as f:
-            f.write(b"test image data")
-            test_file = f.name
-        
-        try:
-            # Test the complete workflow
-            result = await generator.generate_kling_pro(
-                test_file,
-                "A beautiful landscape video",
-                duration=5,
-                aspect_ratio="16:9"
-            )
-            
-            assert "video_url" in result
-            assert mock_fal_client.upload_file.called
-            assert mock_fal_client.subscribe.called
-            
-        finally:
-            os.unlink(test_file)
 
 # ========================================================================
 #                              Main Test Runner                           
@@ -11,6 +11,7 @@ import os
 from pathlib import Path
 from unittest.mock import Mock, patch, AsyncMock
 from concurrent.futures import ThreadPoolExecutor
+import orjson
 
 # Add parent directory to path for imports
 import sys
@@ -18,41 +19,65 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from main import Config, VideoGenerator
 
+# Monotonic integer timer for elapsed-time assertions
+_now = time.perf_counter_ns
+_SECOND = 1_000_000_000
+
+
+@pytest.fixture(scope="class")
+def test_config(tmp_path_factory):
+    """Create test configuration (shared by the class, it is read-only)"""
+    temp_dir = tmp_path_factory.mktemp("perfcfg")
+    config_file = temp_dir / "test_settings.json"
+    test_settings = {
+        "fal_api_key": "",
+        "default_model": "test_model",
+        "output_directory": str(temp_dir / "outputs"),
+        "log_level": "ERROR",  # Reduce log noise during testing
+        "max_duration": 5,
+        "default_aspect_ratio": "16:9"
+    }
+
+    import json
+    config_file.write_text(json.dumps(test_settings, indent=2))
+    return Config(str(config_file))
+
+
+@pytest.fixture(scope="class")
+def stress_test_config(tmp_path_factory):
+    """Configuration for stress testing (shared by the class, it is read-only)"""
+    temp_dir = tmp_path_factory.mktemp("stresscfg")
+    config_file = temp_dir / "stress_config.json"
+
+    import json
+    config_file.write_text(json.dumps({
+        "fal_api_key": "",
+        "default_model": "test_model",
+        "output_directory": str(temp_dir / "outputs"),
+        "log_level": "CRITICAL",  # Minimal logging for performance
+        "max_duration": 3  # Shorter duration for faster tests
+    }))
+
+    return Config(str(config_file))
+
 
 class TestPerformance:
     """Performance and load testing"""
 
     @pytest.fixture
-    def test_config(self):
-        """Create test configuration"""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            config_file = Path(temp_dir) / "test_settings.json"
-            test_settings = {
-                "fal_api_key": "",
-                "default_model": "test_model",
-                "output_directory": str(Path(temp_dir) / "outputs"),
-                "log_level": "ERROR",  # Reduce log noise during testing
-                "max_duration": 5,
-                "default_aspect_ratio": "16:9"
-            }
-            
-            import json
-            config_file.write_text(json.dumps(test_settings, indent=2))
-            yield Config(str(config_file))
-
-    @pytest.fixture
-    def mock_fast_fal_client(self):
+    def mock_fast_fal_client(self, list_async_iter):
         """Mock FAL client with fast responses"""
         with patch('main.fal_client') as mock:
             # Simulate fast responses
             mock.upload_file.return_value = "https://test.url/file.jpg"
             mock.subscribe.return_value = {"video_url": "https://test.url/video.mp4"}
             
-            # Fast async responses
+            # Fast async responses share one handler; iter_events hands out a fresh iterator per call
+            handler = AsyncMock()
+            handler.iter_events = Mock(side_effect=lambda *args, **kwargs: list_async_iter([{"event": "complete"}]))
+            handler.get = AsyncMock(return_value={"video_url": "https://test.url/video.mp4"})
+
             async def fast_submit_async(*args, **kwargs):
-                handler = AsyncMock()
-                handler.iter_events = Mock(return_value=async_iter([{"event": "complete"}]))
-                handler.get = AsyncMock(return_value={"video_url": "https://test.url/video.mp4"})
                 return handler
             
             mock.submit_async.side_effect = fast_submit_async
@@ -70,16 +95,15 @@ class TestPerformance:
                 "settings": {f"setting_{i}": f"value_{i}" for i in range(1000)}
             }
             
-            import json
-            config_file.write_text(json.dumps(large_config, indent=2))
+            config_file.write_bytes(orjson.dumps(large_config))
             
             # Measure loading time
-            start_time = time.time()
+            start_time = _now()
             config = Config(str(config_file))
-            load_time = time.time() - start_time
+            load_time = _now() - start_time
             
             # Should load large config in reasonable time
-            assert load_time < 1.0  # Less than 1 second
+            assert load_time < 1.0 * _SECOND  # Less than 1 second
             assert config.get("models") is not None
 
     @pytest.mark.asyncio
@@ -93,17 +117,17 @@ class TestPerformance:
             test_file = f.name
         
         try:
-            start_time = time.time()
+            start_time = _now()
             result = await generator.generate_kling_pro(
                 test_file,
                 "Test performance prompt",
                 duration=5,
                 aspect_ratio="16:9"
             )
-            generation_time = time.time() - start_time
+            generation_time = _now() - start_time
             
             # Should complete quickly with mocked client
-            assert generation_time < 2.0  # Less than 2 seconds
+            assert generation_time < 2.0 * _SECOND  # Less than 2 seconds
             assert "video_url" in result
             
         finally:
@@ -136,12 +160,12 @@ class TestPerformance:
                 for i in range(5)
             ]
             
-            start_time = time.time()
+            start_time = _now()
             results = await asyncio.gather(*tasks)
-            total_time = time.time() - start_time
+            total_time = _now() - start_time
             
             # Concurrent execution should be faster than sequential
-            assert total_time < 5.0  # Less than 5 seconds for 5 concurrent tasks
+            assert total_time < 5.0 * _SECOND  # Less than 5 seconds for 5 concurrent tasks
             assert len(results) == 5
             assert all("video_url" in result for result in results)
             
@@ -151,11 +175,9 @@ class TestPerformance:
 
     def test_memory_usage_during_operations(self, test_config):
         """Test memory usage during intensive operations"""
-        import psutil
         import gc
         
-        process = psutil.Process()
-        initial_memory = process.memory_info().rss / 1024 / 1024  # MB
+        initial_memory = _rss_mb()
         
         # Perform memory-intensive operations
         generators = []
@@ -164,15 +186,13 @@ class TestPerformance:
         
         # Force garbage collection
         gc.collect()
-        peak_memory = process.memory_info().rss / 1024 / 1024  # MB
+        peak_memory = _rss_mb()
         
         # Clean up
         del generators
         gc.collect()
-        final_memory = process.memory_info().rss / 1024 / 1024  # MB
         
         memory_increase = peak_memory - initial_memory
-        memory_cleanup = peak_memory - final_memory
         
         # Memory usage should be reasonable
         assert memory_increase < 100  # Less than 100MB increase
@@ -183,23 +203,24 @@ class TestPerformance:
         """Test performance with large files"""
         generator = VideoGenerator(test_config)
         
-        # Create large test file (simulated)
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as f:
-            # Write larger data to simulate big image
-            f.write(b"test image data" * 10000)  # ~150KB
-            large_file = f.name
+        # Create large test file (simulated) with a single unbuffered write
+        fd, large_file = tempfile.mkstemp(suffix='.jpg')
+        try:
+            os.write(fd, b"test image data" * 10000)  # ~150KB
+        finally:
+            os.close(fd)
         
         try:
-            start_time = time.time()
+            start_time = _now()
             result = await generator.generate_kling_pro(
                 large_file,
                 "Test large file performance",
                 duration=5
             )
-            processing_time = time.time() - start_time
+            processing_time = _now() - start_time
             
             # Should handle larger files efficiently
-            assert processing_time < 3.0
+            assert processing_time < 3.0 * _SECOND
             assert "video_url" in result
             
         finally:
@@ -208,16 +229,16 @@ class TestPerformance:
     def test_configuration_access_performance(self, test_config):
         """Test configuration access performance"""
         # Measure repeated configuration access
-        start_time = time.time()
+        start_time = _now()
         
         for _ in range(1000):
             value = test_config.get("default_model")
             assert value is not None
         
-        access_time = time.time() - start_time
+        access_time = _now() - start_time
         
         # Configuration access should be very fast
-        assert access_time < 0.1  # Less than 100ms for 1000 accesses
+        assert access_time < 0.1 * _SECOND  # Less than 100ms for 1000 accesses
 
     @pytest.mark.asyncio
     async def test_error_handling_performance(self, test_config):
@@ -225,7 +246,7 @@ class TestPerformance:
         generator = VideoGenerator(test_config)
         
         # Test with non-existent file
-        start_time = time.time()
+        start_time = _now()
         
         try:
             await generator.generate_kling_pro(
@@ -236,18 +257,17 @@ class TestPerformance:
         except Exception:
             pass  # Expected to fail
         
-        error_handling_time = time.time() - start_time
+        error_handling_time = _now() - start_time
         
         # Error handling should be fast
-        assert error_handling_time < 1.0
+        assert error_handling_time < 1.0 * _SECOND
 
     def test_startup_performance(self):
         """Test application startup performance"""
         with tempfile.TemporaryDirectory() as temp_dir:
             config_file = Path(temp_dir) / "startup_config.json"
             
-            import json
-            config_file.write_text(json.dumps({
+            config_file.write_bytes(orjson.dumps({
                 "fal_api_key": "",
                 "default_model": "test_model",
                 "output_directory": str(Path(temp_dir) / "outputs"),
@@ -255,36 +275,19 @@ class TestPerformance:
             }))
             
             # Measure startup time
-            start_time = time.time()
+            start_time = _now()
             config = Config(str(config_file))
             generator = VideoGenerator(config)
-            startup_time = time.time() - start_time
+            startup_time = _now() - start_time
             
             # Startup should be fast
-            assert startup_time < 0.5  # Less than 500ms
+            assert startup_time < 0.5 * _SECOND  # Less than 500ms
             assert generator is not None
 
 
 class TestLoadTesting:
     """Load and stress testing"""
 
-    @pytest.fixture
-    def stress_test_config(self):
-        """Configuration for stress testing"""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            config_file = Path(temp_dir) / "stress_config.json"
-            
-            import json
-            config_file.write_text(json.dumps({
-                "fal_api_key": "",
-                "default_model": "test_model",
-                "output_directory": str(Path(temp_dir) / "outputs"),
-                "log_level": "CRITICAL",  # Minimal logging for performance
-                "max_duration": 3  # Shorter duration for faster tests
-            }))
-            
-            yield Config(str(config_file))
-
     @pytest.mark.asyncio
     async def test_high_concurrency_load(self, stress_test_config):
         """Test high concurrency load"""
@@ -303,27 +306,30 @@ class TestLoadTesting:
                     test_files.append(f.name)
             
             try:
-                # Create high-concurrency tasks
+                # Create high-concurrency tasks, at most 8 in flight at once
+                sem = asyncio.Semaphore(8)
+
                 async def generate_video(image_path, index):
-                    return await generator.generate_kling_pro(
-                        image_path,
-                        f"Load test prompt {index}",
-                        duration=3
-                    )
+                    async with sem:
+                        return await generator.generate_kling_pro(
+                            image_path,
+                            f"Load test prompt {index}",
+                            duration=3
+                        )
                 
                 tasks = [
                     generate_video(test_files[i], i)
                     for i in range(20)
                 ]
                 
-                start_time = time.time()
+                start_time = _now()
                 results = await asyncio.gather(*tasks, return_exceptions=True)
-                total_time = time.time() - start_time
+                total_time = _now() - start_time
                 
                 # Should handle high concurrency
                 successful_results = [r for r in results if not isinstance(r, Exception)]
                 assert len(successful_results) >= 18  # At least 90% success rate
-                assert total_time < 10.0  # Complete within reasonable time
+                assert total_time < 10.0 * _SECOND  # Complete within reasonable time
                 
             finally:
                 for test_file in test_files:
@@ -354,10 +360,16 @@ class TestLoadTesting:
 
 
 # Utility functions
-async def async_iter(items):
-    """Helper to create async iterator from list"""
-    for item in items:
-        yield item
+def _rss_mb() -> float:
+    """Current resident set size of this process in MB"""
+    if sys.platform.startswith("linux"):
+        # Second field of statm is resident pages; cheaper than importing psutil
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    
+    import psutil
+    return psutil.Process().memory_info().rss / 1024 / 1024
 
 
 if __name__ == "__main__":
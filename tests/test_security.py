@@ -4,7 +4,7 @@ Comprehensive security tests for FAL.AI Video Generator
 """
 
 import pytest
-import tempfile
+import asyncio
 import os
 from pathlib import Path
 from unittest.mock import Mock, patch, MagicMock
@@ -13,57 +13,70 @@ from unittest.mock import Mock, patch, MagicMock
 import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from security import InputValidator, SecureConfig, SecurityManager
+from security import (
+    InputValidator, SecureConfig, SecurityManager, SecurityRateLimiter, RateLimitMiddleware,
+    RequestSizeLimitMiddleware
+)
+
+# Stand-ins for SecureConfig.get_api_key_secure, built once for the module
+_KEY_FOUND = Mock(return_value="test_api_key")
+_KEY_MISSING = Mock(return_value=None)
 
 
 class TestInputValidator:
     """Test input validation and sanitization"""
 
-    def test_validate_file_path_valid(self):
+    @pytest.mark.parametrize("path", [
+        "test.jpg",
+        "path/to/file.png",
+        "C:\\path\\to\\file.mp4",
+        "./relative/path.txt",
+    ])
+    def test_validate_file_path_valid(self, path):
         """Test valid file path validation"""
-        assert InputValidator.validate_file_path("test.jpg")
-        assert InputValidator.validate_file_path("path/to/file.png")
-        assert InputValidator.validate_file_path("C:\\path\\to\\file.mp4")
-        assert InputValidator.validate_file_path("./relative/path.txt")
-
-    def test_validate_file_path_invalid(self):
+        assert InputValidator.validate_file_path(path)
+
+    @pytest.mark.parametrize("path", [
+        "",
+        "../../../etc/passwd",
+        "path/with/../traversal",
+        "file<script>alert()</script>",
+        pytest.param("a" * 1001, id="too_long"),
+    ])
+    def test_validate_file_path_invalid(self, path):
         """Test invalid file path rejection"""
-        assert not InputValidator.validate_file_path("")
-        assert not InputValidator.validate_file_path("../../../etc/passwd")
-        assert not InputValidator.validate_file_path("path/with/../traversal")
-        assert not InputValidator.validate_file_path("file<script>alert()</script>")
-        assert not InputValidator.validate_file_path("a" * 1001)  # Too long
+        assert not InputValidator.validate_file_path(path)
 
-    def test_sanitize_file_path_valid(self):
+    def test_sanitize_file_path_valid(self, sample_jpg):
         """Test file path sanitization with existing files"""
-        with tempfile.NamedTemporaryFile(delete=False) as f:
-            test_file = f.name
-        
-        try:
-            result = InputValidator.sanitize_file_path(test_file)
-            assert result == os.path.normpath(test_file)
-        finally:
-            os.unlink(test_file)
+        result = InputValidator.sanitize_file_path(sample_jpg)
+        assert result == os.path.normpath(sample_jpg)
 
     def test_sanitize_file_path_nonexistent(self):
         """Test file path sanitization with non-existent files"""
         result = InputValidator.sanitize_file_path("nonexistent_file.jpg")
         assert result is None
 
-    def test_validate_prompt_valid(self):
+    @pytest.mark.parametrize("prompt", [
+        "A beautiful landscape",
+        "Create a video of a sunset",
+        "Professional corporate meeting",
+    ])
+    def test_validate_prompt_valid(self, prompt):
         """Test valid prompt validation"""
-        assert InputValidator.validate_prompt("A beautiful landscape")
-        assert InputValidator.validate_prompt("Create a video of a sunset")
-        assert InputValidator.validate_prompt("Professional corporate meeting")
-
-    def test_validate_prompt_invalid(self):
+        assert InputValidator.validate_prompt(prompt)
+
+    @pytest.mark.parametrize("prompt", [
+        "",
+        "<script>alert('xss')</script>",
+        "javascript:void(0)",
+        "eval(malicious_code)",
+        "import os; os.system('rm -rf /')",
+        pytest.param("a" * 5001, id="too_long"),
+    ])
+    def test_validate_prompt_invalid(self, prompt):
         """Test dangerous prompt rejection"""
-        assert not InputValidator.validate_prompt("")
-        assert not InputValidator.validate_prompt("<script>alert('xss')</script>")
-        assert not InputValidator.validate_prompt("javascript:void(0)")
-        assert not InputValidator.validate_prompt("eval(malicious_code)")
-        assert not InputValidator.validate_prompt("import os; os.system('rm -rf /')")
-        assert not InputValidator.validate_prompt("a" * 5001)  # Too long
+        assert not InputValidator.validate_prompt(prompt)
 
     def test_sanitize_prompt_valid(self):
         """Test prompt sanitization"""
@@ -77,140 +90,329 @@ class TestInputValidator:
         result = InputValidator.sanitize_prompt(dangerous_prompt)
         assert result is None
 
-    def test_validate_duration_valid(self):
+    @pytest.mark.parametrize("payload", [
+        "<script>" + "a" * 1200 + "</script>",
+        "<script type='text/javascript' " + "x" * 600 + ">alert(1)</script>",
+        "${" + "a" * 300 + "}",
+        "{{" + "a" * 1200 + "}}",
+        "<?php " + "a" * 1200 + " ?>",
+        "<% " + "a" * 1200 + " %>",
+        "/*" + "a" * 1200 + "*/",
+    ], ids=["script", "script_attrs", "dollar_template", "brace_template", "php", "asp", "sql_comment"])
+    def test_prompt_blacklist_matches_long_payloads(self, payload):
+        """Test injection payloads are caught however long their bodies are"""
+        assert InputValidator.PROMPT_BLACKLIST.search(payload)
+
+    def test_prompt_blacklist_compiles_with_re2(self):
+        """Test the blacklist compiles under RE2 (no repeat counts over its limit of 1000)"""
+        re2 = pytest.importorskip("re2")
+        blacklist = re2.compile('(?is)' + '|'.join(InputValidator.DANGEROUS_PATTERNS))
+        assert blacklist.search("<script>alert('test')</script>")
+        assert blacklist.search("{{ config }}")
+        assert not blacklist.search("A beautiful landscape")
+
+    def test_prompt_blacklist_uses_re2_when_installed(self):
+        """Test the blacklist is compiled by RE2, not silently by the re fallback"""
+        re2 = pytest.importorskip("re2")
+        assert type(InputValidator.PROMPT_BLACKLIST) is type(re2.compile("a"))
+
+    def test_is_repetitive(self):
+        """Test spam detection on repeated words"""
+        assert not InputValidator.is_repetitive("A beautiful landscape with mountains")
+        assert not InputValidator.is_repetitive("")
+        assert InputValidator.is_repetitive("buy buy buy buy buy now")
+
+    @pytest.mark.parametrize("duration, expected", [
+        (5, 5),
+        ("10", 10),
+        (1, 1),
+        (60, 60),
+    ])
+    def test_validate_duration_valid(self, duration, expected):
         """Test valid duration validation"""
-        assert InputValidator.validate_duration(5) == 5
-        assert InputValidator.validate_duration("10") == 10
-        assert InputValidator.validate_duration(1) == 1
-        assert InputValidator.validate_duration(60) == 60
+        assert InputValidator.validate_duration(duration) == expected
 
-    def test_validate_duration_invalid(self):
+    @pytest.mark.parametrize("duration", [0, 61, -5, "invalid", None])
+    def test_validate_duration_invalid(self, duration):
         """Test invalid duration rejection"""
-        assert InputValidator.validate_duration(0) is None
-        assert InputValidator.validate_duration(61) is None
-        assert InputValidator.validate_duration(-5) is None
-        assert InputValidator.validate_duration("invalid") is None
-        assert InputValidator.validate_duration(None) is None
+        assert InputValidator.validate_duration(duration) is None
 
-    def test_validate_aspect_ratio_valid(self):
+    @pytest.mark.parametrize("ratio", ["16:9", "9:16", "1:1", "4:3"])
+    def test_validate_aspect_ratio_valid(self, ratio):
         """Test valid aspect ratio validation"""
-        assert InputValidator.validate_aspect_ratio("16:9") == "16:9"
-        assert InputValidator.validate_aspect_ratio("9:16") == "9:16"
-        assert InputValidator.validate_aspect_ratio("1:1") == "1:1"
-        assert InputValidator.validate_aspect_ratio("4:3") == "4:3"
+        assert InputValidator.validate_aspect_ratio(ratio) == ratio
 
-    def test_validate_aspect_ratio_invalid(self):
+    @pytest.mark.parametrize("ratio", ["invalid", "16:10", "", None])
+    def test_validate_aspect_ratio_invalid(self, ratio):
         """Test invalid aspect ratio rejection"""
-        assert InputValidator.validate_aspect_ratio("invalid") is None
-        assert InputValidator.validate_aspect_ratio("16:10") is None
-        assert InputValidator.validate_aspect_ratio("") is None
-        assert InputValidator.validate_aspect_ratio(None) is None
-
-    def test_validate_cfg_scale_valid(self):
+        assert InputValidator.validate_aspect_ratio(ratio) is None
+
+    @pytest.mark.parametrize("scale, expected", [
+        (0.5, 0.5),
+        ("0.3", 0.3),
+        (0.0, 0.0),
+        (1.0, 1.0),
+    ])
+    def test_validate_cfg_scale_valid(self, scale, expected):
         """Test valid CFG scale validation"""
-        assert InputValidator.validate_cfg_scale(0.5) == 0.5
-        assert InputValidator.validate_cfg_scale("0.3") == 0.3
-        assert InputValidator.validate_cfg_scale(0.0) == 0.0
-        assert InputValidator.validate_cfg_scale(1.0) == 1.0
+        assert InputValidator.validate_cfg_scale(scale) == expected
 
-    def test_validate_cfg_scale_invalid(self):
+    @pytest.mark.parametrize("scale", [-0.1, 1.1, "invalid", None])
+    def test_validate_cfg_scale_invalid(self, scale):
         """Test invalid CFG scale rejection"""
-        assert InputValidator.validate_cfg_scale(-0.1) is None
-        assert InputValidator.validate_cfg_scale(1.1) is None
-        assert InputValidator.validate_cfg_scale("invalid") is None
-        assert InputValidator.validate_cfg_scale(None) is None
-
-    def test_validate_url_valid(self):
+        assert InputValidator.validate_cfg_scale(scale) is None
+
+    @pytest.mark.parametrize("url", [
+        "https://example.com/file.jpg",
+        "http://test.org/image.png",
+        # Private-looking digits elsewhere in the URL are fine
+        "https://example.com/v10.2/image.png",
+    ])
+    def test_validate_url_valid(self, url):
         """Test valid URL validation"""
-        assert InputValidator.validate_url("https://example.com/file.jpg")
-        assert InputValidator.validate_url("http://test.org/image.png")
-
-    def test_validate_url_invalid(self):
+        assert InputValidator.validate_url(url)
+
+    @pytest.mark.parametrize("url", [
+        "not_a_url",
+        "javascript:alert('xss')",
+        "",
+    ])
+    def test_validate_url_invalid(self, url):
         """Test invalid URL rejection"""
-        assert not InputValidator.validate_url("not_a_url")
-        assert not InputValidator.validate_url("javascript:alert('xss')")
-        assert not InputValidator.validate_url("")
+        assert not InputValidator.validate_url(url)
+
+    @pytest.mark.parametrize("url", [
+        "http://localhost/image.png",
+        "http://10.0.0.5/image.png",
+        "http://172.16.0.1/image.png",
+        "http://169.254.169.254/latest/meta-data",
+        "http://[::1]/image.png",
+    ])
+    def test_validate_url_private_hosts(self, url):
+        """Test local and private network addresses are rejected"""
+        assert not InputValidator.validate_url(url)
+
+
+class TestSecurityRateLimiter:
+    """Test token-bucket rate limiting"""
+
+    def test_allows_burst_up_to_limit(self):
+        """Test that max_requests pass and the next one is limited"""
+        limiter = SecurityRateLimiter()
+        
+        results = [limiter.is_rate_limited("client", max_requests=5, window=60) for _ in range(6)]
+        
+        assert results == [False] * 5 + [True]
+
+    def test_identifiers_are_independent(self):
+        """Test that one identifier's usage does not limit another"""
+        limiter = SecurityRateLimiter()
+        
+        for _ in range(6):
+            limiter.is_rate_limited("noisy", max_requests=5, window=60)
+        
+        assert not limiter.is_rate_limited("quiet", max_requests=5, window=60)
+
+    def test_exact_window_mode(self):
+        """Test strict rolling-window mode enforces the same limit"""
+        limiter = SecurityRateLimiter(exact_window=True)
+
+        results = [limiter.is_rate_limited("client", max_requests=5, window=60) for _ in range(6)]
+
+        assert results == [False] * 5 + [True]
+
+    def test_block_duration_zero_does_not_block(self):
+        """Test that a limiter without a block period records no lockout"""
+        limiter = SecurityRateLimiter(exact_window=True, block_duration=0)
+
+        results = [limiter.is_rate_limited("client", max_requests=2, window=60) for _ in range(3)]
+
+        assert results == [False, False, True]
+        assert not limiter.blocked_ips
+
+
+class TestRateLimitMiddleware:
+    """Test the ASGI hot-endpoint rate limiter"""
+
+    @staticmethod
+    def _call(middleware, path, client=("127.0.0.1", 5000)):
+        """Drive the middleware with a minimal HTTP scope and return the sent messages"""
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "path": path, "client": client}
+        asyncio.run(middleware(scope, receive, send))
+        return sent
+
+    @staticmethod
+    async def _ok_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    def test_allows_requests_within_limit(self):
+        """Test that requests under the limit reach the wrapped app"""
+        middleware = RateLimitMiddleware(self._ok_app, limits={"/api/models": 2})
+
+        for _ in range(2):
+            assert self._call(middleware, "/api/models")[0]["status"] == 200
+
+    def test_returns_429_over_limit(self):
+        """Test that the request over the limit gets a 429 JSON response"""
+        middleware = RateLimitMiddleware(self._ok_app, limits={"/api/job/": 1})
+        self._call(middleware, "/api/job/abc")
+
+        start, body = self._call(middleware, "/api/job/abc")
+
+        assert start["status"] == 429
+        assert body["body"] == b'{"detail":"Rate limit exceeded"}'
+
+    def test_unlimited_paths_and_other_clients_pass(self):
+        """Test that unmatched paths and other clients are not affected"""
+        middleware = RateLimitMiddleware(self._ok_app, limits={"/api/job/": 1})
+        self._call(middleware, "/api/job/abc")
+
+        assert self._call(middleware, "/api/job/abc", client=("10.0.0.2", 5000))[0]["status"] == 200
+        assert self._call(middleware, "/api/upload")[0]["status"] == 200
+
+
+class TestRequestSizeLimitMiddleware:
+    """Test the ASGI request size check"""
+
+    @staticmethod
+    def _call(middleware, path, content_length):
+        """Drive the middleware with a request declaring content_length and return the sent messages"""
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "path": path, "headers": [(b"content-length", content_length)]}
+        asyncio.run(middleware(scope, receive, send))
+        return sent
+
+    @staticmethod
+    async def _ok_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    @pytest.fixture
+    def middleware(self):
+        return RequestSizeLimitMiddleware(self._ok_app, limits={"/api/upload": 100}, detail="Too big")
+
+    def test_allows_requests_within_limit(self, middleware):
+        """Test that a declared size at the limit reaches the wrapped app"""
+        assert self._call(middleware, "/api/upload", b"100")[0]["status"] == 200
 
+    def test_rejects_oversized_request(self, middleware):
+        """Test that a declared size over the limit gets a 413 JSON response"""
+        start, body = self._call(middleware, "/api/upload", b"101")
 
+        assert start["status"] == 413
+        assert body["body"] == b'{"detail":"Too big"}'
+
+    def test_rejects_invalid_content_length(self, middleware):
+        """Test that a malformed Content-Length gets a 400"""
+        assert self._call(middleware, "/api/upload", b"lots")[0]["status"] == 400
+
+    def test_other_paths_pass(self, middleware):
+        """Test that paths without a limit are not checked"""
+        assert self._call(middleware, "/api/models", b"101")[0]["status"] == 200
+
+
+@pytest.fixture(scope="class")
+def secure_config(tmp_path_factory):
+    """One SecureConfig (and key file) shared by the tests that never store an API key"""
+    return SecureConfig(base_dir=str(tmp_path_factory.mktemp("secure_config")))
+
+
+@pytest.mark.xdist_group("secconfig")
 class TestSecureConfig:
     """Test secure configuration management"""
 
     @pytest.fixture
-    def temp_dir(self):
-        """Create temporary directory for testing"""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            original_cwd = os.getcwd()
-            os.chdir(temp_dir)
-            yield temp_dir
-            os.chdir(original_cwd)
-
-    def test_encryption_key_generation(self, temp_dir):
+    def temp_dir(self, tmp_path):
+        """Empty base directory for a SecureConfig"""
+        return str(tmp_path)
+
+    def test_encryption_key_generation(self, secure_config):
         """Test encryption key generation and storage"""
-        config = SecureConfig()
-        assert config.encryption_key is not None
-        assert len(config.encryption_key) == 44  # Fernet key length
+        assert secure_config.encryption_key is not None
+        assert len(secure_config.encryption_key) == 44  # Fernet key length
 
         # Test key persistence
-        key_path = Path("./.encryption_key")
+        key_path = secure_config.base_dir / ".encryption_key"
         assert key_path.exists()
 
-    def test_data_encryption_decryption(self, temp_dir):
+    def test_data_encryption_decryption(self, secure_config):
         """Test data encryption and decryption"""
-        config = SecureConfig()
         test_data = "sensitive_api_key_12345"
         
-        encrypted = config.encrypt_sensitive_data(test_data)
-        decrypted = config.decrypt_sensitive_data(encrypted)
+        encrypted = secure_config.encrypt_sensitive_data(test_data)
+        decrypted = secure_config.decrypt_sensitive_data(encrypted)
         
         assert encrypted != test_data
         assert decrypted == test_data
 
-    @patch.dict(os.environ, {"FAL_KEY": "test_api_key_from_env"})
-    def test_get_api_key_from_env(self, temp_dir):
+    def test_get_api_key_from_env(self, secure_config, monkeypatch):
         """Test API key retrieval from environment"""
-        config = SecureConfig()
-        api_key = config.get_api_key_secure()
+        monkeypatch.setenv("FAL_KEY", "test_api_key_from_env")
+        api_key = secure_config.get_api_key_secure()
         assert api_key == "test_api_key_from_env"
 
+    @patch('security._stdin_is_interactive', return_value=True)
     @patch('builtins.input', return_value='user_input_api_key')
-    def test_get_api_key_from_input(self, mock_input, temp_dir):
+    def test_get_api_key_from_input(self, mock_input, mock_interactive, temp_dir, monkeypatch):
         """Test API key retrieval from user input"""
         # Clear environment variable
-        with patch.dict(os.environ, {}, clear=True):
-            config = SecureConfig()
-            api_key = config.get_api_key_secure()
-            assert api_key == "user_input_api_key"
-            
-            # Verify encrypted storage
-            encrypted_key_path = Path("./config/encrypted_api_key")
-            assert encrypted_key_path.exists()
+        monkeypatch.delenv("FAL_KEY", raising=False)
+        config = SecureConfig(base_dir=temp_dir)
+        api_key = config.get_api_key_secure()
+        assert api_key == "user_input_api_key"
+        
+        # Verify encrypted storage
+        encrypted_key_path = Path(temp_dir) / "config" / "encrypted_api_key"
+        assert encrypted_key_path.exists()
 
+    @patch('security._stdin_is_interactive', return_value=True)
     @patch('builtins.input', side_effect=['', 'invalid!@#$%^&*()', 'valid_api_key'])
-    def test_api_key_input_validation(self, mock_input, temp_dir):
+    def test_api_key_input_validation(self, mock_input, mock_interactive, temp_dir, monkeypatch):
         """Test API key input validation"""
-        with patch.dict(os.environ, {}, clear=True):
-            config = SecureConfig()
-            api_key = config.get_api_key_secure()
-            assert api_key == "valid_api_key"
+        monkeypatch.delenv("FAL_KEY", raising=False)
+        config = SecureConfig(base_dir=temp_dir)
+        api_key = config.get_api_key_secure()
+        assert api_key == "valid_api_key"
+
+    @patch('builtins.input')
+    def test_get_api_key_non_interactive(self, mock_input, secure_config, monkeypatch):
+        """Test missing API key fails fast instead of prompting"""
+        monkeypatch.delenv("FAL_KEY", raising=False)
+        monkeypatch.setenv("NONINTERACTIVE", "1")
+        with pytest.raises(ValueError, match="not interactive"):
+            secure_config.get_api_key_secure()
+        mock_input.assert_not_called()
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """SecurityManager keeping its key files under tmp_path, not the working directory"""
+    return SecurityManager(base_dir=str(tmp_path))
 
 
 class TestSecurityManager:
     """Test security manager integration"""
 
-    @pytest.fixture
-    def temp_image_file(self):
-        """Create temporary image file for testing"""
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as f:
-            f.write(b"fake image data")
-            yield f.name
-        os.unlink(f.name)
-
-    def test_validate_and_sanitize_valid_inputs(self, temp_image_file):
+    def test_validate_and_sanitize_valid_inputs(self, manager, sample_jpg):
         """Test validation of valid inputs"""
-        manager = SecurityManager()
-        
         inputs = {
-            'image_path': temp_image_file,
+            'image_path': sample_jpg,
             'prompt': 'A beautiful landscape',
             'duration': 10,
             'aspect_ratio': '16:9',
@@ -219,16 +421,14 @@ class TestSecurityManager:
         
         result = manager.validate_and_sanitize_inputs(**inputs)
         
-        assert result['image_path'] == temp_image_file
+        assert result['image_path'] == sample_jpg
         assert result['prompt'] == 'A beautiful landscape'
         assert result['duration'] == 10
         assert result['aspect_ratio'] == '16:9'
         assert result['cfg_scale'] == 0.5
 
-    def test_validate_and_sanitize_invalid_inputs(self):
+    def test_validate_and_sanitize_invalid_inputs(self, manager):
         """Test validation rejection of invalid inputs"""
-        manager = SecurityManager()
-        
         # Test invalid image path
         with pytest.raises(ValueError, match="Invalid or missing image file"):
             manager.validate_and_sanitize_inputs(
@@ -248,21 +448,52 @@ class TestSecurityManager:
                 duration=100
             )
 
-    @patch('security.SecureConfig.get_api_key_secure')
-    def test_get_secure_api_key_success(self, mock_get_key):
+    def test_compiled_validator(self, manager, sample_jpg):
+        """Test per-model compiled validator matches generic validation"""
+        validate = manager.compile_validator({"endpoint": "test/model", "max_duration": 9})
+
+        inputs = {
+            'image_path': sample_jpg,
+            'prompt': 'A beautiful landscape',
+            'duration': 5,
+            'aspect_ratio': '16:9',
+            'cfg_scale': 0.5
+        }
+
+        assert validate(inputs) == manager.validate_and_sanitize_inputs(**inputs)
+
+        # Duration is bounded by the model's own max_duration
+        with pytest.raises(ValueError, match="Invalid duration"):
+            validate(dict(inputs, duration=10))
+
+        with pytest.raises(ValueError, match="Invalid aspect ratio"):
+            validate(dict(inputs, aspect_ratio="5:7"))
+
+    def test_failed_attempts_are_bounded(self, manager):
+        """Test failed attempt counts flag suspicious activity and stay bounded"""
+        manager.failed_attempts.maxsize = 2
+
+        for _ in range(11):
+            manager.log_failed_attempt("attacker")
+        assert manager.is_suspicious_activity("attacker")
+        assert not manager.is_suspicious_activity("someone_else")
+
+        manager.log_failed_attempt("second")
+        manager.log_failed_attempt("third")
+        assert len(manager.failed_attempts) == 2
+        assert not manager.is_suspicious_activity("attacker")
+
+    def test_get_secure_api_key_success(self, manager, monkeypatch):
         """Test successful API key retrieval"""
-        mock_get_key.return_value = "test_api_key"
-        manager = SecurityManager()
-        
+        monkeypatch.setattr("security.SecureConfig.get_api_key_secure", _KEY_FOUND)
+
         api_key = manager.get_secure_api_key()
         assert api_key == "test_api_key"
 
-    @patch('security.SecureConfig.get_api_key_secure')
-    def test_get_secure_api_key_failure(self, mock_get_key):
+    def test_get_secure_api_key_failure(self, manager, monkeypatch):
         """Test API key retrieval failure"""
-        mock_get_key.return_value = None
-        manager = SecurityManager()
-        
+        monkeypatch.setattr("security.SecureConfig.get_api_key_secure", _KEY_MISSING)
+
         with pytest.raises(ValueError, match="API key is required"):
             manager.get_secure_api_key()
 
@@ -270,73 +501,38 @@ class TestSecurityManager:
 class TestSecurityIntegration:
     """Integration tests for security features"""
 
-    @pytest.fixture
-    def temp_environment(self):
-        """Create isolated test environment"""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            original_cwd = os.getcwd()
-            os.chdir(temp_dir)
-            yield temp_dir
-            os.chdir(original_cwd)
-
-    def test_end_to_end_security_workflow(self, temp_environment):
+    def test_end_to_end_security_workflow(self, manager, sample_jpg):
         """Test complete security workflow"""
-        from security import security_manager
+        # Test input validation
+        validated = manager.validate_and_sanitize_inputs(
+            image_path=sample_jpg,
+            prompt="A beautiful test video",
+            duration=5,
+            aspect_ratio="16:9"
+        )
         
-        # Create test image file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as f:
-            f.write(b"test image data")
-            test_image = f.name
-        
-        try:
-            # Test input validation
-            validated = security_manager.validate_and_sanitize_inputs(
-                image_path=test_image,
-                prompt="A beautiful test video",
-                duration=5,
-                aspect_ratio="16:9"
-            )
-            
-            assert validated['image_path'] == test_image
-            assert validated['prompt'] == "A beautiful test video"
-            assert validated['duration'] == 5
-            assert validated['aspect_ratio'] == "16:9"
-            
-        finally:
-            os.unlink(test_image)
-
-    def test_security_with_optional_parameters(self, temp_environment):
+        assert validated['image_path'] == sample_jpg
+        assert validated['prompt'] == "A beautiful test video"
+        assert validated['duration'] == 5
+        assert validated['aspect_ratio'] == "16:9"
+
+    def test_security_with_optional_parameters(self, manager, sample_jpg):
         """Test security validation with optional parameters"""
-        from security import security_manager
+        # The same image serves as both main and tail frame
+        validated = manager.validate_and_sanitize_inputs(
+            image_path=sample_jpg,
+            tail_image_path=sample_jpg,
+            prompt="Main prompt",
+            negative_prompt="Negative prompt",
+            duration=10,
+            aspect_ratio="9:16",
+            cfg_scale=0.7
+        )
         
-        # Create test files
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as f1:
-            f1.write(b"main image")
-            main_image = f1.name
-            
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as f2:
-            f2.write(b"tail image")
-            tail_image = f2.name
-        
-        try:
-            validated = security_manager.validate_and_sanitize_inputs(
-                image_path=main_image,
-                tail_image_path=tail_image,
-                prompt="Main prompt",
-                negative_prompt="Negative prompt",
-                duration=10,
-                aspect_ratio="9:16",
-                cfg_scale=0.7
-            )
-            
-            assert all(key in validated for key in [
-                'image_path', 'tail_image_path', 'prompt', 
-                'negative_prompt', 'duration', 'aspect_ratio', 'cfg_scale'
-            ])
-            
-        finally:
-            os.unlink(main_image)
-            os.unlink(tail_image)
+        assert all(key in validated for key in [
+            'image_path', 'tail_image_path', 'prompt', 
+            'negative_prompt', 'duration', 'aspect_ratio', 'cfg_scale'
+        ])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Web application middleware tests for FAL.AI Video Generator
+"""
+
+import pytest
+import asyncio
+import uuid
+from pathlib import Path
+
+# Add parent directory to path for imports
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from starlette.testclient import TestClient
+
+import web_app
+
+ORIGIN = "http://localhost:8000"
+
+
+@pytest.fixture
+def client():
+    """Client on an allowed host; lifespan is not run, so no workers start"""
+    return TestClient(web_app.app, base_url="http://localhost")
+
+
+class TestMiddlewareOrder:
+    """Test that early rejections still pass through the outer middleware"""
+
+    def test_rate_limited_response_has_cors_and_security_headers(self, client):
+        """Test a 429 from the hot-endpoint limiter carries CORS and security headers"""
+        limit = web_app.HOT_ENDPOINT_LIMITS["/api/job/"]
+        for _ in range(limit):
+            client.get("/api/job/unknown", headers={"Origin": ORIGIN})
+
+        response = client.get("/api/job/unknown", headers={"Origin": ORIGIN})
+
+        assert response.status_code == 429
+        assert response.headers["access-control-allow-origin"] == ORIGIN
+        for name, value in web_app.SECURITY_HEADERS.items():
+            assert response.headers[name] == value
+
+    def test_oversized_upload_response_has_cors_and_security_headers(self, client):
+        """Test a 413 for an oversized upload carries CORS and security headers"""
+        response = client.post(
+            "/api/upload",
+            content=b"x",
+            headers={"Origin": ORIGIN, "Content-Length": str(web_app.MAX_UPLOAD_REQUEST_SIZE + 1)},
+        )
+
+        assert response.status_code == 413
+        assert response.json() == {"detail": "File too large. Maximum size is 10MB"}
+        assert response.headers["access-control-allow-origin"] == ORIGIN
+        for name, value in web_app.SECURITY_HEADERS.items():
+            assert response.headers[name] == value
+
+
+class TestFindUpload:
+    """Test locating uploads by file_id"""
+
+    @pytest.fixture(autouse=True)
+    def upload_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(web_app, "UPLOAD_DIR", tmp_path)
+        return tmp_path
+
+    def test_finds_upload_by_whitelisted_extension(self, upload_dir):
+        """Test that a stored upload is found under its extension"""
+        file_id = str(uuid.uuid4())
+        (upload_dir / f"{file_id}.png").write_bytes(b"png")
+
+        assert asyncio.run(web_app.find_upload(file_id)) == str(upload_dir / f"{file_id}.png")
+
+    @pytest.mark.parametrize("file_id", [
+        str(uuid.UUID(int=1)),
+        "../secret",
+        "{%s}" % uuid.UUID(int=1),
+    ], ids=["missing", "traversal", "non_canonical"])
+    def test_unknown_or_invalid_ids_are_not_found(self, upload_dir, file_id):
+        """Test that missing uploads and ids upload_file never issues resolve to None"""
+        (upload_dir / f"{uuid.UUID(int=1)}.exe").write_bytes(b"exe")
+
+        assert asyncio.run(web_app.find_upload(file_id)) is None
+
+
+class TestGetValidator:
+    """Test per-model validators without running startup"""
+
+    @pytest.fixture(autouse=True)
+    def empty_validators(self, monkeypatch):
+        monkeypatch.setattr(web_app, "_VALIDATORS", {})
+
+    def test_compiles_configured_model_on_first_use(self):
+        """Test that a configured model's validator is built lazily and then reused"""
+        model = next(iter(web_app.config.get("models")))
+
+        validate = web_app.get_validator(model)
+
+        assert callable(validate)
+        assert web_app.get_validator(model) is validate
+
+    def test_unknown_model_has_no_validator(self):
+        """Test that models missing from the configuration get None"""
+        assert web_app.get_validator("no_such_model") is None
@@ -8,16 +8,20 @@ import asyncio
 import os
 import json
 import uuid
+import secrets
 import tempfile
+import time
+from collections import deque
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Set, Callable
 from datetime import datetime
 
+import orjson
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.requests import Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from slowapi import Limiter, _rate_limit_exceeded_handler
@@ -28,12 +32,18 @@ import uvicorn
 
 # Import our existing modules
 from main import Config, VideoGenerator
-from security import security_manager
+from security import PRODUCTION, get_security_manager, RateLimitMiddleware, RequestSizeLimitMiddleware
 from performance import (
     performance_optimizer, cache_manager, async_file_manager,
-    performance_monitor_decorator, optimized_api_call
+    performance_monitor_decorator, optimized_api_call, TTLCache
 )
 
+class ORJSONResponse(JSONResponse):
+    """JSON response serialized with orjson (FastAPI's own ORJSONResponse is deprecated)"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
 # ========================================================================
 #                              Web Application                            
 # ========================================================================
@@ -42,8 +52,9 @@ app = FastAPI(
     title="FAL.AI Video Generator",
     description="Professional Video Generation Interface",
     version="2.0.0",
-    docs_url=None if os.getenv("PRODUCTION", "false").lower() == "true" else "/docs",
-    redoc_url=None if os.getenv("PRODUCTION", "false").lower() == "true" else "/redoc"
+    default_response_class=ORJSONResponse,
+    docs_url=None if PRODUCTION else "/docs",
+    redoc_url=None if PRODUCTION else "/redoc"
 )
 
 # Rate limiting configuration
@@ -51,10 +62,47 @@ limiter = Limiter(key_func=get_remote_address)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+# Shared rate-limit decorators
+limit_30_per_minute = limiter.limit("30/minute")
+limit_10_per_minute = limiter.limit("10/minute")
+limit_5_per_minute = limiter.limit("5/minute")
+
 # Production CORS configuration
 ALLOWED_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:8000,http://127.0.0.1:8000,http://localhost:8001,http://127.0.0.1:8001").split(",")
 ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "localhost,127.0.0.1").split(",")
 
+UPLOAD_DIR = Path("./temp/uploads")  # Created once in startup_event
+# Maximum accepted upload size (10MB)
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+# Accepted upload types and the extension each is stored under
+UPLOAD_EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/jpg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/gif": ".gif",
+}
+# Whole multipart request: the file plus boundaries and part headers
+MAX_UPLOAD_REQUEST_SIZE = MAX_UPLOAD_SIZE + 64 * 1024
+
+# Hot read endpoints are limited in-process instead of through slowapi decorators
+# (path prefix -> requests per minute per client)
+HOT_ENDPOINT_LIMITS = {
+    "/api/models": 60,
+    "/api/preview/": 100,
+    "/api/job/": 60,
+}
+
+# The last middleware added runs outermost, so these early rejections are added
+# first: their 429/413s pass through TrustedHost, CORS and the security headers
+app.add_middleware(RateLimitMiddleware, limits=HOT_ENDPOINT_LIMITS, window=60)
+# The form body is parsed before upload_file runs, so check the declared size up front
+app.add_middleware(
+    RequestSizeLimitMiddleware,
+    limits={"/api/upload": MAX_UPLOAD_REQUEST_SIZE},
+    detail="File too large. Maximum size is 10MB",
+)
+
 # Security middleware
 app.add_middleware(
     TrustedHostMiddleware, 
@@ -72,34 +120,36 @@ app.add_middleware(
     max_age=3600,  # Cache preflight requests for 1 hour
 )
 
+# Security headers applied to every response (built once at import)
+CONTENT_SECURITY_POLICY = (
+    "default-src 'self'; "
+    "script-src 'self' 'unsafe-inline' https://cdn.tailwindcss.com; "
+    "style-src 'self' 'unsafe-inline' https://cdnjs.cloudflare.com; "
+    "font-src 'self' https://cdnjs.cloudflare.com; "
+    "img-src 'self' data: blob:; "
+    "media-src 'self' blob:; "
+    "connect-src 'self' wss: ws:; "
+    "frame-ancestors 'none'; "
+    "base-uri 'self';"
+)
+
+SECURITY_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+    "X-Frame-Options": "DENY",
+    "X-XSS-Protection": "1; mode=block",
+    "Referrer-Policy": "strict-origin-when-cross-origin",
+    "Permissions-Policy": "geolocation=(), microphone=(), camera=()",
+    "Content-Security-Policy": CONTENT_SECURITY_POLICY,
+}
+
 # Security headers middleware
 @app.middleware("http")
 async def add_security_headers(request: Request, call_next):
     response = await call_next(request)
-    
-    # Security headers
-    response.headers["X-Content-Type-Options"] = "nosniff"
-    response.headers["X-Frame-Options"] = "DENY"
-    response.headers["X-XSS-Protection"] = "1; mode=block"
-    response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-    response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
-    
-    # Content Security Policy
-    csp = (
-        "default-src 'self'; "
-        "script-src 'self' 'unsafe-inline' https://cdn.tailwindcss.com; "
-        "style-src 'self' 'unsafe-inline' https://cdnjs.cloudflare.com; "
-        "font-src 'self' https://cdnjs.cloudflare.com; "
-        "img-src 'self' data: blob:; "
-        "media-src 'self' blob:; "
-        "connect-src 'self' wss: ws:; "
-        "frame-ancestors 'none'; "
-        "base-uri 'self';"
-    )
-    response.headers["Content-Security-Policy"] = csp
+    response.headers.update(SECURITY_HEADERS)
     
     # HTTPS enforcement in production
-    if os.getenv("PRODUCTION", "false").lower() == "true":
+    if PRODUCTION:
         response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
     
     return response
@@ -112,36 +162,85 @@ templates = Jinja2Templates(directory="web/templates")
 config = Config()
 generator = VideoGenerator(config)
 
+# Legacy per-model generators, used when the generic endpoint call fails
+LEGACY_GENERATORS = {
+    "kling_21_standard": generator.generate_kling_21_standard,
+    "kling_21_pro": generator.generate_kling_21_pro,
+    "kling_21_master": generator.generate_kling_21_master,
+    "kling_16_pro": generator.generate_kling_v16,
+    "workflow": lambda **inputs: generator.run_workflow(arguments=inputs),
+}
+
+# Extensions uploads are stored under, probed in turn to find a file_id's upload
+UPLOAD_SUFFIXES = tuple(dict.fromkeys(UPLOAD_EXTENSIONS.values()))
+
+async def find_upload(file_id: str) -> Optional[str]:
+    """Path of the upload saved as UPLOAD_DIR/<file_id><ext>, without scanning the directory"""
+    # Only ids upload_file could have issued, so client input never shapes the path
+    try:
+        if str(uuid.UUID(file_id)) != file_id:
+            return None
+    except ValueError:
+        return None
+    for suffix in UPLOAD_SUFFIXES:
+        path = str(UPLOAD_DIR / f"{file_id}{suffix}")
+        if await async_file_manager.is_file(path):
+            return path
+    return None
+
+# Model name -> input validator specialised for that model, built in startup_event
+_VALIDATORS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {}
+
+def get_validator(model: str) -> Optional[Callable[[Dict[str, Any]], Dict[str, Any]]]:
+    """Precompiled validator for a configured model (compiled on first use if startup was skipped)"""
+    validate = _VALIDATORS.get(model)
+    if validate is None:
+        spec = config.get("models", {}).get(model)
+        if spec is None:
+            return None
+        validate = _VALIDATORS[model] = get_security_manager().compile_validator(spec)
+    return validate
+
 # WebSocket connection manager for real-time updates
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.job_status: Dict[str, Dict] = {}
+        self.active_connections: Set[WebSocket] = set()
+        self.job_status = TTLCache(maxsize=10_000, ttl=3600)  # job_id -> status
+        self.history: deque = deque(maxlen=1000)  # Completed jobs, oldest first
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections.add(websocket)
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        self.active_connections.discard(websocket)
 
     async def send_personal_message(self, message: dict, websocket: WebSocket):
         await websocket.send_json(message)
 
     async def broadcast_job_update(self, job_id: str, status: dict):
         self.job_status[job_id] = status
-        message = {"job_id": job_id, "status": status}
-        
-        dead_connections = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except:
-                dead_connections.append(connection)
-        
+        if status.get("status") == "completed":
+            self.history.append({
+                "id": job_id,
+                "timestamp": status.get("timestamp"),
+                "status": status.get("status"),
+                "result": status.get("result")
+            })
+        # Encode once and fan out to every client concurrently
+        message = orjson.dumps({"job_id": job_id, "status": status}).decode()
+
+        connections = list(self.active_connections)
+        results = await asyncio.gather(
+            *(connection.send_text(message) for connection in connections),
+            return_exceptions=True
+        )
+
         # Clean up dead connections
-        for connection in dead_connections:
-            self.active_connections.remove(connection)
+        self.active_connections -= {
+            connection for connection, result in zip(connections, results)
+            if isinstance(result, Exception)
+        }
 
 manager = ConnectionManager()
 
@@ -150,7 +249,7 @@ manager = ConnectionManager()
 # ========================================================================
 
 @app.get("/", response_class=HTMLResponse)
-@limiter.limit("30/minute")
+@limit_30_per_minute
 async def home(request: Request):
     """Main application page"""
     return templates.TemplateResponse("index.html", {
@@ -159,10 +258,8 @@ async def home(request: Request):
         "models": config.get("models", {})
     })
 
-@app.get("/api/models")
-@limiter.limit("60/minute")
-async def get_models(request: Request):
-    """Get available models with detailed cost information"""
+def build_models_response() -> Dict[str, Any]:
+    """Build the /api/models payload (a pure function of the static model config)"""
     models = config.get("models", {})
     
     # Filter out non-dict entries and add cost calculations
@@ -181,18 +278,25 @@ async def get_models(request: Request):
                 "recommended": key in ["kling_21_pro", "kling_21_standard"]  # Highlight recommended models
             }
     
-    # Calculate cost ranges if we have models
+    # Calculate cost ranges if we have models (single pass over the models)
     cost_calculator = {}
     if enhanced_models:
+        min_5s = min_10s = float("inf")
+        max_5s = max_10s = float("-inf")
+        for m in enhanced_models.values():
+            cost_5s, cost_10s = m["cost_5s"], m["cost_10s"]
+            if cost_5s < min_5s:
+                min_5s = cost_5s
+            if cost_5s > max_5s:
+                max_5s = cost_5s
+            if cost_10s < min_10s:
+                min_10s = cost_10s
+            if cost_10s > max_10s:
+                max_10s = cost_10s
+        
         cost_calculator = {
-            "5s_range": {
-                "min": min(m["cost_5s"] for m in enhanced_models.values()),
-                "max": max(m["cost_5s"] for m in enhanced_models.values())
-            },
-            "10s_range": {
-                "min": min(m["cost_10s"] for m in enhanced_models.values()),
-                "max": max(m["cost_10s"] for m in enhanced_models.values())
-            }
+            "5s_range": {"min": min_5s, "max": max_5s},
+            "10s_range": {"min": min_10s, "max": max_10s}
         }
     
     return {
@@ -201,66 +305,67 @@ async def get_models(request: Request):
         "cost_calculator": cost_calculator
     }
 
+@app.get("/api/models")
+async def get_models(request: Request):
+    """Get available models with detailed cost information"""
+    # Built once at startup; rebuilt lazily if startup was skipped
+    models_response = getattr(request.app.state, "models_response", None)
+    if models_response is None:
+        models_response = request.app.state.models_response = build_models_response()
+    return models_response
+
 @app.post("/api/upload")
-@limiter.limit("10/minute")
+@limit_10_per_minute
 @performance_monitor_decorator("file_upload")
 async def upload_file(request: Request, file: UploadFile = File(...)):
     """Upload and validate image file"""
     try:
-        # Enhanced file validation
-        if not file.content_type.startswith('image/'):
-            raise HTTPException(status_code=400, detail="Only image files are allowed")
-        
-        # File size limit (10MB)
-        content = await file.read()
-        if len(content) > 10 * 1024 * 1024:
-            raise HTTPException(status_code=413, detail="File too large. Maximum size is 10MB")
-        
-        # Reset file pointer after reading
-        await file.seek(0)
+        # Enhanced file validation; the stored extension comes from the whitelist, never the client filename
+        file_extension = UPLOAD_EXTENSIONS.get(file.content_type)
+        if file_extension is None:
+            raise HTTPException(status_code=415, detail="Only JPEG, PNG, WebP and GIF images are allowed")
         
         # Save uploaded file temporarily
-        upload_dir = Path("./temp/uploads")
-        upload_dir.mkdir(parents=True, exist_ok=True)
-        
         file_id = str(uuid.uuid4())
-        file_extension = Path(file.filename).suffix
-        temp_path = upload_dir / f"{file_id}{file_extension}"
+        temp_path = UPLOAD_DIR / f"{file_id}{file_extension}"
         
-        # File already read above for size validation
-        await async_file_manager.write_file(str(temp_path), content)
+        # Stream to disk in chunks, enforcing the size limit as data arrives
+        try:
+            size = await async_file_manager.write_stream(str(temp_path), file, max_size=MAX_UPLOAD_SIZE)
+        except ValueError:
+            raise HTTPException(status_code=413, detail="File too large. Maximum size is 10MB")
         
         # Validate with security manager
-        validated_path = security_manager.validator.sanitize_file_path(str(temp_path))
+        validated_path = get_security_manager().validator.sanitize_file_path(str(temp_path))
         if not validated_path:
-            os.unlink(temp_path)
+            await async_file_manager.delete_file(str(temp_path))
             raise HTTPException(status_code=400, detail="Invalid or unsafe file")
         
         return {
             "file_id": file_id,
             "filename": file.filename,
-            "size": len(content),
+            "size": size,
             "path": str(temp_path),
             "preview_url": f"/api/preview/{file_id}{file_extension}"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 @app.get("/api/preview/{file_path}")
-@limiter.limit("100/minute")
 async def get_file_preview(request: Request, file_path: str):
     """Get file preview (serve uploaded images)"""
-    full_path = Path("./temp/uploads") / file_path
+    full_path = UPLOAD_DIR / file_path
     
-    if not full_path.exists() or not full_path.is_file():
+    if not await async_file_manager.is_file(str(full_path)):
         raise HTTPException(status_code=404, detail="File not found")
     
-    from fastapi.responses import FileResponse
     return FileResponse(full_path)
 
 @app.post("/api/generate")
-@limiter.limit("5/minute")
+@limit_5_per_minute
 async def generate_video(
     request: Request,
     model: str = Form(...),
@@ -274,17 +379,14 @@ async def generate_video(
 ):
     """Generate video with security validation"""
     try:
-        # Generate job ID
-        job_id = str(uuid.uuid4())
+        # Generate job ID (unguessable, but cheaper than formatting a uuid4)
+        job_id = secrets.token_hex(8)
         
         # Find uploaded file
-        upload_dir = Path("./temp/uploads")
-        image_files = list(upload_dir.glob(f"{file_id}*"))
-        if not image_files:
+        image_path = await find_upload(file_id)
+        if not image_path:
             raise HTTPException(status_code=404, detail="Uploaded file not found")
         
-        image_path = str(image_files[0])
-        
         # Prepare generation parameters
         kwargs = {
             "image_path": image_path,
@@ -298,21 +400,34 @@ async def generate_video(
         if cfg_scale is not None:
             kwargs["cfg_scale"] = cfg_scale
         if tail_file_id:
-            tail_files = list(upload_dir.glob(f"{tail_file_id}*"))
-            if tail_files:
-                kwargs["tail_image_path"] = str(tail_files[0])
+            tail_image_path = await find_upload(tail_file_id)
+            if tail_image_path:
+                kwargs["tail_image_path"] = tail_image_path
         
         # Enhanced input validation
         if len(prompt) > 2000:  # Reasonable prompt length
             raise HTTPException(status_code=400, detail="Prompt too long")
         
-        # Validate inputs with security manager
-        validated_inputs = security_manager.validate_and_sanitize_inputs(**kwargs)
+        # Validate inputs with the model's precompiled validator
+        validate = get_validator(model)
+        if validate is None:
+            raise HTTPException(status_code=400, detail=f"Unknown model: {model}")
+        validated_inputs = validate(kwargs)
         
-        # Start generation in background
-        asyncio.create_task(
-            background_generation(job_id, model, validated_inputs)
-        )
+        # Hand the job to the worker pool; reject instead of piling up when it is saturated
+        if job_queue is None:
+            raise HTTPException(status_code=503, detail="Generation workers are not running")
+        try:
+            job_queue.put_nowait((job_id, model, validated_inputs))
+        except asyncio.QueueFull:
+            raise HTTPException(status_code=503, detail="Too many pending generations, please retry shortly")
+        
+        manager.job_status[job_id] = {
+            "status": "queued",
+            "progress": 0,
+            "message": "Waiting for a free generation worker...",
+            "timestamp": iso_now()
+        }
         
         # Return job ID for tracking
         return {
@@ -321,36 +436,49 @@ async def generate_video(
             "message": "Video generation started"
         }
         
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
+# Bounded generation worker pool, started in startup_event
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "8"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "256"))
+
+job_queue: Optional[asyncio.Queue] = None
+generation_workers: List[asyncio.Task] = []
+
+async def generation_worker():
+    """Pull queued jobs and run them one at a time"""
+    while True:
+        job_id, model, validated_inputs = await job_queue.get()
+        try:
+            await background_generation(job_id, model, validated_inputs)
+        finally:
+            job_queue.task_done()
+
+# Status timestamps have one-second resolution, format each second only once
+_timestamp_cache = (0, "")
+
+def iso_now() -> str:
+    """Current local time as an ISO 8601 string (second resolution)"""
+    global _timestamp_cache
+    now = int(time.time())
+    if now != _timestamp_cache[0]:
+        _timestamp_cache = (now, datetime.fromtimestamp(now).isoformat())
+    return _timestamp_cache[1]
+
 async def background_generation(job_id: str, model: str, validated_inputs: Dict[str, Any]):
     """Background task for video generation with progress updates"""
     try:
-        # Update status: Starting
-        await manager.broadcast_job_update(job_id, {
-            "status": "starting",
-            "progress": 0,
-            "message": "Initializing generation...",
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        # Update status: Uploading
-        await manager.broadcast_job_update(job_id, {
-            "status": "uploading",
-            "progress": 20,
-            "message": "Uploading image to FAL.AI...",
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        # Update status: Processing
+        # Single real transition: a worker has picked up the job and generation is under way
         await manager.broadcast_job_update(job_id, {
             "status": "processing",
-            "progress": 40,
+            "progress": 20,
             "message": "Generating video...",
-            "timestamp": datetime.now().isoformat()
+            "timestamp": iso_now()
         })
         
         # Get model configuration
@@ -369,18 +497,10 @@ async def background_generation(job_id: str, model: str, validated_inputs: Dict[
             result = await generator.generate_video(endpoint, **validated_inputs)
         except Exception as e:
             # Try legacy method mapping for backward compatibility
-            if model == "kling_21_standard":
-                result = await generator.generate_kling_21_standard(**validated_inputs)
-            elif model == "kling_21_pro":
-                result = await generator.generate_kling_21_pro(**validated_inputs)
-            elif model == "kling_21_master":
-                result = await generator.generate_kling_21_master(**validated_inputs)
-            elif model == "kling_16_pro":
-                result = await generator.generate_kling_v16(**validated_inputs)
-            elif model == "workflow":
-                result = await generator.run_workflow(arguments=validated_inputs)
-            else:
+            legacy_generate = LEGACY_GENERATORS.get(model)
+            if legacy_generate is None:
                 raise ValueError(f"Model {model} not supported: {str(e)}")
+            result = await legacy_generate(**validated_inputs)
         
         # Update status: Completed
         await manager.broadcast_job_update(job_id, {
@@ -388,7 +508,7 @@ async def background_generation(job_id: str, model: str, validated_inputs: Dict[
             "progress": 100,
             "message": "Video generation completed!",
             "result": result,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": iso_now()
         })
         
     except Exception as e:
@@ -398,17 +518,19 @@ async def background_generation(job_id: str, model: str, validated_inputs: Dict[
             "progress": 0,
             "message": f"Generation failed: {str(e)}",
             "error": str(e),
-            "timestamp": datetime.now().isoformat()
+            "timestamp": iso_now()
         })
 
 @app.get("/api/job/{job_id}")
-@limiter.limit("60/minute")
 async def get_job_status(request: Request, job_id: str):
     """Get job status"""
-    if job_id not in manager.job_status:
+    status = manager.job_status.get(job_id)
+    if status is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    return manager.job_status[job_id]
+    return status
+
+WS_ECHO_PREFIX = "Message received: "
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -417,31 +539,23 @@ async def websocket_endpoint(websocket: WebSocket):
     try:
         while True:
             data = await websocket.receive_text()
-            # Echo received data (for connection testing)
-            await websocket.send_text(f"Message received: {data}")
+            # Cheap keepalive for health checks, otherwise echo (for connection testing)
+            if data == "ping":
+                await websocket.send_text("pong")
+            else:
+                await websocket.send_text(WS_ECHO_PREFIX + data)
     except WebSocketDisconnect:
         manager.disconnect(websocket)
 
 @app.get("/api/history")
-@limiter.limit("30/minute")
+@limit_30_per_minute
 async def get_generation_history(request: Request):
     """Get generation history"""
     # Simple in-memory history (could be replaced with database)
-    return {
-        "history": [
-            {
-                "id": job_id,
-                "timestamp": status.get("timestamp"),
-                "status": status.get("status"),
-                "result": status.get("result")
-            }
-            for job_id, status in manager.job_status.items()
-            if status.get("status") == "completed"
-        ]
-    }
+    return {"history": list(manager.history)}
 
 @app.get("/api/performance")
-@limiter.limit("10/minute")
+@limit_10_per_minute
 async def get_performance_metrics(request: Request):
     """Get application performance metrics"""
     return performance_optimizer.get_performance_report()
@@ -458,7 +572,7 @@ async def get_prometheus_metrics():
 
 @app.exception_handler(404)
 async def not_found_handler(request: Request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=404,
         content={"detail": "Resource not found"}
     )
@@ -467,21 +581,21 @@ async def not_found_handler(request: Request, exc):
 async def server_error_handler(request: Request, exc):
     # Log the actual error but don't expose it
     logger.error(f"Internal server error: {exc}")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={"detail": "Internal server error"}
     )
 
 @app.exception_handler(413)
 async def payload_too_large_handler(request: Request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=413,
         content={"detail": "Request payload too large"}
     )
 
 @app.exception_handler(422)
 async def validation_error_handler(request: Request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=422,
         content={"detail": "Validation error"}
     )
@@ -493,10 +607,27 @@ async def validation_error_handler(request: Request, exc):
 @app.on_event("startup")
 async def startup_event():
     """Initialize application on startup"""
+    global job_queue
+    
     # Create necessary directories
-    directories = ["./temp/uploads", "./web/static", "./web/templates"]
+    directories = [UPLOAD_DIR, Path("./web/static"), Path("./web/templates")]
     for directory in directories:
-        Path(directory).mkdir(parents=True, exist_ok=True)
+        directory.mkdir(parents=True, exist_ok=True)
+    
+    # Model catalogue only changes on restart, build its response once
+    app.state.models_response = build_models_response()
+    
+    # Specialise input validation once per model instead of per request
+    _VALIDATORS.update(
+        (name, get_security_manager().compile_validator(spec))
+        for name, spec in config.get("models", {}).items()
+    )
+    
+    # Start the generation worker pool
+    job_queue = asyncio.Queue(maxsize=JOB_QUEUE_SIZE)
+    generation_workers.extend(
+        asyncio.create_task(generation_worker()) for _ in range(WORKER_CONCURRENCY)
+    )
     
     # Initialize performance optimizations
     await performance_optimizer.initialize()
@@ -511,17 +642,22 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
+    # Stop generation workers
+    for worker in generation_workers:
+        worker.cancel()
+    await asyncio.gather(*generation_workers, return_exceptions=True)
+    generation_workers.clear()
+    
     # Cleanup performance optimizations
     await performance_optimizer.cleanup()
     
     # Clean up temporary files
-    temp_dir = Path("./temp/uploads")
-    if temp_dir.exists():
-        for file in temp_dir.glob("*"):
-            try:
-                file.unlink()
-            except:
-                pass
+    if UPLOAD_DIR.exists():
+        # Remove all files concurrently off the event loop; failures are ignored as before
+        await asyncio.gather(
+            *(async_file_manager.delete_file(str(file)) for file in UPLOAD_DIR.iterdir()),
+            return_exceptions=True
+        )
 
 # ========================================================================
 #                              Main                                      